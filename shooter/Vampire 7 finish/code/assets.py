@@ -0,0 +1,17 @@
+from settings import *
+
+masks = {}
+silhouettes = {}
+
+def get_mask(surf):
+    if surf not in masks:
+        masks[surf] = pygame.mask.from_surface(surf)
+    return masks[surf]
+
+def get_silhouette(surf):
+    # the white flash a dying enemy shows
+    if surf not in silhouettes:
+        silhouette = get_mask(surf).to_surface()
+        silhouette.set_colorkey('black')
+        silhouettes[surf] = silhouette
+    return silhouettes[surf]
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from math import ceil, sqrt
+from settings import *
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+images_dir = os.path.join(os.path.dirname(script_dir), 'images')
+atlas_dir = os.path.join(images_dir, 'atlas')
+
+# ui art is stored at the size it is shown: a rotozoom factor, or WINDOW to fill the window
+WINDOW = 'window'
+UI_SCALES = {
+    'heart': 0.05,
+    'logo': 0.5,
+    'start': 0.2,
+    'quit': 0.2,
+    'main_menu': 0.2,
+    'paused': 1,
+}
+# window-sized ui art is not packed: each is stored scaled and opaque in a file of its own
+BACKGROUNDS = ('menu_background', 'gameover')
+PADDING = 1
+
+def frame_files(folder):
+    return [join(folder, name) for name in sorted(os.listdir(folder), key = lambda name: int(name.split('.')[0]))]
+
+def atlas_sources(name):
+    # frame set name -> (image files in frame order, scale)
+    if name in BACKGROUNDS:
+        return {name: ([join(images_dir, 'ui', name + '.png')], WINDOW)}
+    if name == 'ui':
+        return {ui_name: ([join(images_dir, 'ui', ui_name + '.png')], scale) for ui_name, scale in UI_SCALES.items()}
+    if name == 'gun':
+        return {gun_name: ([join(images_dir, 'gun', gun_name + '.png')], 1) for gun_name in ('gun', 'bullet')}
+    folder = join(images_dir, name)
+    return {set_name: (frame_files(join(folder, set_name)), 1) for set_name in sorted(os.listdir(folder))}
+
+def source_digest(name):
+    # hashed by content, not mtime: a fresh clone touches every file but changes none of them
+    digest = hashlib.sha1()
+    for set_name, (paths, scale) in atlas_sources(name).items():
+        # window-sized art goes stale with the window size, not the word 'window'
+        if scale == WINDOW:
+            scale = f'{WINDOW_WIDTH}x{WINDOW_HEIGHT}'
+        digest.update(f'{set_name}:{scale}'.encode())
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def scale_image(surf, scale):
+    if scale == WINDOW:
+        return pygame.transform.scale(surf, (WINDOW_WIDTH, WINDOW_HEIGHT))
+    if scale != 1:
+        return pygame.transform.rotozoom(surf, 0, scale)
+    return surf
+
+def pack(sizes):
+    # shelf packing: tallest first, left to right, a new shelf when the row is full
+    width = max(max(w for w, _ in sizes), ceil(sqrt(sum((w + PADDING) * (h + PADDING) for w, h in sizes)) * 1.2))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+    for index in sorted(range(len(sizes)), key = lambda index: -sizes[index][1]):
+        w, h = sizes[index]
+        if x + w > width:
+            x, y, shelf_height = 0, y + shelf_height + PADDING, 0
+        positions[index] = (x, y)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+    return (width, y + shelf_height), positions
+
+def build_atlas(name):
+    # returns the packed surface and its frame table: frame set name -> [x, y, w, h] per frame
+    images, owners = [], []
+    for set_name, (paths, scale) in atlas_sources(name).items():
+        for path in paths:
+            images.append(scale_image(pygame.image.load(path).convert_alpha(), scale))
+            owners.append(set_name)
+    size, positions = pack([image.get_size() for image in images])
+
+    surf = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    surf.fill((0, 0, 0, 0))
+    table = {}
+    for image, set_name, pos in zip(images, owners, positions):
+        # copy the pixels, alpha included, instead of blending them onto the empty atlas
+        surf.blit(image, pos, special_flags = pygame.BLEND_RGBA_MAX)
+        table.setdefault(set_name, []).append([*pos, *image.get_size()])
+    return surf, table
+
+class Atlas:
+    def __init__(self, image, table):
+        self.image = image
+        self.frames = {set_name: [image.subsurface(rect) for rect in rects] for set_name, rects in table.items()}
+
+    def frame(self, set_name, index = 0):
+        return self.frames[set_name][index]
+
+def build_background(name):
+    # flattened onto black, which the screens behind it clear to, so it blits without alpha
+    (path,), scale = atlas_sources(name)[name]
+    surf = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+    surf.fill('black')
+    surf.blit(scale_image(pygame.image.load(path).convert_alpha(), scale), (0, 0))
+    return surf
+
+atlases = {}
+backgrounds = {}
+
+def read_saved(name):
+    # the unconverted image and JSON that save_atlas or save_background wrote,
+    # or None when they are missing or older than the source images
+    try:
+        with open(join(atlas_dir, name + '.json')) as f:
+            data = json.load(f)
+        if data['sources'] != source_digest(name):
+            return None
+        return pygame.image.load(join(atlas_dir, name + '.png')), data
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None
+
+def write_saved(name, surf, **fields):
+    os.makedirs(atlas_dir, exist_ok = True)
+    pygame.image.save(surf, join(atlas_dir, name + '.png'))
+    with open(join(atlas_dir, name + '.json'), 'w') as f:
+        json.dump({'size': surf.get_size(), 'sources': source_digest(name), **fields}, f, indent = 4)
+
+def read_atlas(name):
+    saved = read_saved(name)
+    if saved:
+        image, data = saved
+        return image.convert_alpha(), data['frames']
+    return None
+
+def load_atlas(name):
+    # a missing or stale atlas is packed in memory from the source images instead
+    if name not in atlases:
+        atlases[name] = Atlas(*(read_atlas(name) or build_atlas(name)))
+    return atlases[name]
+
+def load_background(name):
+    if name not in backgrounds:
+        saved = read_saved(name)
+        backgrounds[name] = saved[0].convert() if saved else build_background(name)
+    return backgrounds[name]
+
+def save_atlas(name):
+    surf, table = build_atlas(name)
+    write_saved(name, surf, frames = table)
+    return surf, table
+
+def save_background(name):
+    surf = build_background(name)
+    write_saved(name, surf)
+    return surf
+
+ATLASES = ('player', 'enemies', 'gun', 'ui')
+
+if __name__ == '__main__':
+    # run after changing any art in images/ to rebuild images/atlas
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    for name in ATLASES:
+        surf, table = save_atlas(name)
+        print(f'{name}: {sum(len(rects) for rects in table.values())} frames in {surf.get_width()}x{surf.get_height()}')
+    for name in BACKGROUNDS:
+        surf = save_background(name)
+        print(f'{name}: {surf.get_width()}x{surf.get_height()}')
@@ -0,0 +1,77 @@
+from settings import *
+
+class Effect:
+    def __init__(self, path, volume, voices, priority):
+        self.path = path
+        self.volume = volume
+        self.voices = voices
+        self.priority = priority
+        self.sound = None
+        self.last_played = None
+
+class AudioManager:
+    # effects load on first use; each effect and each priority level gets a voice budget,
+    # a full budget stops its oldest voice, and a repeat inside SOUND_REPEAT_WINDOW is dropped
+    def __init__(self, folder, channels = AUDIO_CHANNELS, priority_voices = AUDIO_PRIORITY_VOICES):
+        self.folder = folder
+        self.priority_voices = priority_voices
+        self.effects = {}
+        self.voices = []
+        pygame.mixer.set_num_channels(channels)
+
+    def register(self, name, file_name, volume = 1, voices = 2, priority = 1):
+        self.effects[name] = Effect(join(self.folder, file_name), volume, voices, priority)
+
+    def get_sound(self, effect):
+        if effect.sound is None:
+            effect.sound = pygame.mixer.Sound(effect.path)
+            effect.sound.set_volume(effect.volume)
+        return effect.sound
+
+    def playing(self):
+        # voices, oldest first, whose channel still plays their sound
+        self.voices = [voice for voice in self.voices if voice[0].get_busy() and voice[0].get_sound() is voice[1].sound]
+        return self.voices
+
+    def play(self, name):
+        effect = self.effects[name]
+        current_time = pygame.time.get_ticks()
+        if effect.last_played is not None and current_time - effect.last_played < SOUND_REPEAT_WINDOW:
+            return
+        effect.last_played = current_time
+        sound = self.get_sound(effect)
+
+        voices = self.playing()
+        same_effect = [voice for voice in voices if voice[1] is effect]
+        same_priority = [voice for voice in voices if voice[1].priority == effect.priority]
+        if len(same_effect) >= effect.voices:
+            victim = same_effect[0]
+        elif len(same_priority) >= self.priority_voices.get(effect.priority, len(voices) + 1):
+            victim = same_priority[0]
+        else:
+            victim = None
+            channel = pygame.mixer.find_channel()
+            if channel is None:
+                # every channel is busy: take the oldest voice of the least important priority not above this one
+                lower = [voice for voice in voices if voice[1].priority <= effect.priority]
+                if not lower:
+                    return
+                victim = min(lower, key = lambda voice: voice[1].priority)
+        if victim:
+            self.voices.remove(victim)
+            channel = victim[0]
+            channel.stop()
+        channel.play(sound)
+        self.voices.append((channel, effect))
+
+    def play_music(self, file_name, volume = 1, loops = -1):
+        # streamed from disk by the mixer instead of decoded into memory
+        try:
+            pygame.mixer.music.load(join(self.folder, file_name))
+        except (pygame.error, FileNotFoundError):
+            return
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(loops)
+
+    def stop_music(self):
+        pygame.mixer.music.stop()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+from math import cos, sin
+from settings import *
+from main import Game, game_dir
+from controls import controls
+from profiler import profiler
+
+# scripted load cases: enemies alive at the start, frames to run and whether the player holds the trigger
+SCENARIOS = {
+    'enemies_50': {'enemies': 50, 'frames': 600, 'fire': False},
+    'enemies_500': {'enemies': 500, 'frames': 600, 'fire': False},
+    'enemies_5000': {'enemies': 5000, 'frames': 300, 'fire': False},
+    'heavy_fire': {'enemies': 300, 'frames': 600, 'fire': True},
+    'idle': {'enemies': 0, 'frames': 3600, 'fire': False},
+}
+WALK = [(pygame.K_d,), (pygame.K_s,), (pygame.K_a,), (pygame.K_w,), ()]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples):
+    return {
+        'mean': sum(samples) / len(samples),
+        'p50': percentile(samples, 0.5),
+        'p90': percentile(samples, 0.9),
+        'p99': percentile(samples, 0.99),
+        'max': max(samples),
+    }
+
+def script_input(frame, fire):
+    # walk a slow square and sweep the aim around the player
+    keys = WALK[frame // 90 % len(WALK)]
+    angle = frame / 20
+    mouse_pos = (WINDOW_WIDTH / 2 + cos(angle) * 200, WINDOW_HEIGHT / 2 + sin(angle) * 200)
+    controls.set(keys, mouse_pos, (fire, False, False))
+
+def run_scenario(game, scenario, seed):
+    game.random.seed(seed)
+    game.reset()
+    gun_cooldown = game.gun_cooldown
+    if scenario['fire']:
+        game.gun_cooldown = 0
+    for _ in range(scenario['enemies']):
+        game.spawn_enemy(game.random.choice(game.spawn_positions), game.random.choice(list(game.enemy_frames)))
+
+    # the profiler keeps every frame of the scenario
+    profiler.reset(scenario['frames'])
+    for frame in range(scenario['frames']):
+        script_input(frame, scenario['fire'])
+        pygame.event.pump()
+        with profiler.scope('frame'):
+            game.update(game.fixed_dt)
+            game.combat_collisions()
+            game.draw()
+        game.count_sprites()
+        profiler.end_frame()
+
+    game.gun_cooldown = gun_cooldown
+    result = {name: summarize(values) for name, values in profiler.timings.items()}
+    result['counters'] = {name: summarize(values) for name, values in profiler.counters.items()}
+    result['frames'] = scenario['frames']
+    result['score'] = game.score
+    result['pools'] = game.pool_stats()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Run the scripted load scenarios headless and report frame times in ms.')
+    parser.add_argument('scenarios', nargs = '*', default = list(SCENARIOS), help = 'scenarios to run, all by default')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--fps', type = int, default = 60, help = 'fixed simulation rate')
+    parser.add_argument('--swarm', action = 'store_true', help = 'run enemies on the numpy swarm engine')
+    parser.add_argument('--out', default = 'benchmark.json')
+    parser.add_argument('--trace', help = 'also write a Chrome trace of the run to this file')
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    trace = args.trace and os.path.abspath(args.trace)
+    os.chdir(game_dir)
+    profiler.enabled = True
+    if trace:
+        profiler.start_trace()
+    game = Game(headless = True, fixed_dt = 1 / args.fps, seed = args.seed)
+    game.swarm_mode = args.swarm
+    report = {'seed': args.seed, 'fps': args.fps, 'swarm': args.swarm, 'scenarios': {}}
+    for name in args.scenarios:
+        profiler.mark(name)
+        result = run_scenario(game, SCENARIOS[name], args.seed)
+        report['scenarios'][name] = result
+        print(f"{name}: frame p50 {result['frame']['p50']:.2f} ms, p99 {result['frame']['p99']:.2f} ms")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=4)
+    if trace:
+        profiler.save_trace(trace)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
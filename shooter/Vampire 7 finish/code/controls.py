@@ -0,0 +1,25 @@
+from settings import *
+
+class KeyState(frozenset):
+    # a set of pressed keys that reads like pygame.key.get_pressed()
+    def __getitem__(self, key):
+        return key in self
+
+class Controls:
+    # the input state read by Player, Gun and Game for the current frame
+    def __init__(self):
+        self.keys = KeyState()
+        self.mouse_pos = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)
+        self.mouse_buttons = (False, False, False)
+
+    def poll(self):
+        self.keys = pygame.key.get_pressed()
+        self.mouse_pos = pygame.mouse.get_pos()
+        self.mouse_buttons = pygame.mouse.get_pressed()
+
+    def set(self, keys = (), mouse_pos = None, mouse_buttons = (False, False, False)):
+        self.keys = KeyState(keys)
+        self.mouse_pos = mouse_pos if mouse_pos is not None else self.mouse_pos
+        self.mouse_buttons = tuple(mouse_buttons)
+
+controls = Controls()
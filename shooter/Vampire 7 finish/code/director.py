@@ -0,0 +1,69 @@
+from settings import *
+from bisect import bisect_right
+from collections import deque
+
+class SpawnDirector:
+    # waves follow SPAWN_CURVE; while adaptive, a live enemy cap tracks the frame budget:
+    # cut on an overrun, raised step by step while there is headroom
+    def __init__(self, random, adaptive = True):
+        self.random = random
+        self.adaptive = adaptive
+        self.budget = 1000 / FPS
+        self.frame_times = deque(maxlen = FRAME_BUDGET_WINDOW)
+        self.spawn_positions = []
+        self.enemy_types = []
+        self.reset()
+
+    def reset(self, spawn_positions = (), enemy_types = ()):
+        self.spawn_positions = list(spawn_positions)
+        self.enemy_types = list(enemy_types)
+        self.spawn_time = 0
+        self.backlog = 0
+        self.cap = SPAWN_CAP if self.adaptive else None
+        self.frame_times.clear()
+
+    def wave(self, current_time):
+        # (ms between waves, enemies per wave) at this point of the game, the last segment's growth carries on past the curve
+        seconds = current_time / 1000
+        times = [point[0] for point in SPAWN_CURVE]
+        index = min(max(bisect_right(times, seconds), 1), len(SPAWN_CURVE) - 1)
+        (start, start_interval, start_size), (end, end_interval, end_size) = SPAWN_CURVE[index - 1], SPAWN_CURVE[index]
+        progress = (seconds - start) / (end - start)
+        interval = start_interval + (end_interval - start_interval) * min(progress, 1)
+        size = start_size + (end_size - start_size) * progress
+        return interval, max(1, int(size))
+
+    def update(self, current_time, alive):
+        # the (position, enemy type, strength) to spawn this frame; enemies held back
+        # by the cap are merged into the strength of the next units that fit
+        interval, size = self.wave(current_time)
+        if current_time - self.spawn_time < interval:
+            return []
+        self.spawn_time = current_time
+        self.backlog = min(self.backlog + size, SPAWN_BACKLOG)
+
+        room = self.backlog if self.cap is None else max(0, self.cap - alive)
+        units = min(room, self.backlog)
+        spawns = []
+        for unit in range(units):
+            strength = min(-(-self.backlog // (units - unit)), SPAWN_MAX_STRENGTH)
+            self.backlog -= strength
+            spawns.append((self.random.choice(self.spawn_positions), self.random.choice(self.enemy_types), strength))
+        return spawns
+
+    def excess(self, alive):
+        return 0 if self.cap is None else max(0, alive - self.cap)
+
+    def record_frame(self, frame_time, alive):
+        # frame_time is the work of one frame in ms, the sleep to the frame rate left out
+        if not self.adaptive:
+            return
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+        average = sum(self.frame_times) / len(self.frame_times)
+        if average > self.budget:
+            self.cap = max(SPAWN_CAP_MIN, int(min(self.cap, alive) * SPAWN_CAP_DECREASE))
+        elif average < self.budget * FRAME_BUDGET_HEADROOM and alive >= self.cap:
+            self.cap = min(SPAWN_CAP_MAX, self.cap + SPAWN_CAP_STEP)
+        self.frame_times.clear()
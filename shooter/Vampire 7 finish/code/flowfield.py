@@ -0,0 +1,82 @@
+from settings import *
+from collections import deque
+from math import ceil, sqrt
+
+class FlowField:
+    NEIGHBOURS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+    def __init__(self, columns, rows, collision_rects, clearance = (0, 0), tile_size = TILE_SIZE):
+        self.columns, self.rows, self.tile_size = columns, rows, tile_size
+
+        # a tile is blocked when its centre lies inside a collider grown by the agents' hitbox size
+        self.blocked = [False] * (columns * rows)
+        for rect in collision_rects:
+            rect = rect.inflate(clearance)
+            for y in range(max(0, ceil((rect.top - tile_size / 2) / tile_size)), min(rows, ceil((rect.bottom - tile_size / 2) / tile_size))):
+                for x in range(max(0, ceil((rect.left - tile_size / 2) / tile_size)), min(columns, ceil((rect.right - tile_size / 2) / tile_size))):
+                    self.blocked[y * columns + x] = True
+
+        self.distances = [None] * (columns * rows)
+        self.directions = {}
+        self.target = None
+        self.version = 0
+
+    def tile_index(self, pos):
+        x, y = int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)
+        if 0 <= x < self.columns and 0 <= y < self.rows:
+            return y * self.columns + x
+        return None
+
+    def update(self, target_pos):
+        # one breadth-first pass from the target tile, only when the target changes tile
+        target = self.tile_index(target_pos)
+        if target == self.target:
+            return
+        self.target = target
+        self.version += 1
+        self.directions.clear()
+
+        columns, rows, blocked = self.columns, self.rows, self.blocked
+        distances = [None] * (columns * rows)
+        if target is not None:
+            distances[target] = 0
+            queue = deque([target])
+            while queue:
+                index = queue.popleft()
+                x, y = index % columns, index // columns
+                distance = distances[index] + 1
+                for neighbour, inside in ((index - 1, x > 0), (index + 1, x < columns - 1), (index - columns, y > 0), (index + columns, y < rows - 1)):
+                    if inside and distances[neighbour] is None and not blocked[neighbour]:
+                        distances[neighbour] = distance
+                        queue.append(neighbour)
+        self.distances = distances
+
+    def next_tile(self, index):
+        # centre of the neighbour closest to the target, None to steer straight
+        if index in self.directions:
+            return self.directions[index]
+        next_pos = None
+        if index is not None and index != self.target:
+            columns, blocked = self.columns, self.blocked
+            x, y = index % columns, index // columns
+            best = self.distances[index] if self.distances[index] is not None else float('inf')
+            for dx, dy in self.NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < columns and 0 <= ny < self.rows):
+                    continue
+                if dx and dy and (blocked[y * columns + nx] or blocked[ny * columns + x]):
+                    continue
+                distance = self.distances[ny * columns + nx]
+                if distance is not None and distance < best:
+                    best, next_pos = distance, ((nx + 0.5) * self.tile_size, (ny + 0.5) * self.tile_size)
+        self.directions[index] = next_pos
+        return next_pos
+
+    def direction(self, pos):
+        next_pos = self.next_tile(self.tile_index(pos))
+        if next_pos:
+            dx, dy = next_pos[0] - pos[0], next_pos[1] - pos[1]
+            length = sqrt(dx * dx + dy * dy)
+            if length:
+                return dx / length, dy / length
+        return None
\ No newline at end of file
@@ -1,18 +1,123 @@
-from settings import * 
+from settings import *
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from profiler import profiler
+
+class GroundLayer:
+    def __init__(self, tiles, tile_size = TILE_SIZE, chunk_size = CHUNK_SIZE):
+        # bake the tile layer into chunk surfaces once, so drawing costs a few blits
+        self.tile_size = tile_size
+        self.chunk_size = chunk_size
+        self.chunk_pixels = tile_size * chunk_size
+        self.chunks = {}
+        self.pending = {}
+        for x, y, image in tiles:
+            self.pending.setdefault((x // chunk_size, y // chunk_size), []).append((x, y, image))
+
+    def bake(self, count = None):
+        # bakes up to count chunks, all by default; True when none are left
+        while self.pending and count != 0:
+            key, tiles = self.pending.popitem()
+            chunk = pygame.Surface((self.chunk_pixels, self.chunk_pixels)).convert()
+            for x, y, image in tiles:
+                chunk.blit(image, ((x % self.chunk_size) * self.tile_size, (y % self.chunk_size) * self.tile_size))
+            self.chunks[key] = chunk
+            count = count - 1 if count else count
+        return not self.pending
+
+    def draw(self, surface, offset):
+        size = self.chunk_pixels
+        left, top = int(-offset.x // size), int(-offset.y // size)
+        right = int((-offset.x + surface.get_width()) // size)
+        bottom = int((-offset.y + surface.get_height()) // size)
+        blits = 0
+        for chunk_y in range(top, bottom + 1):
+            for chunk_x in range(left, right + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk:
+                    surface.blit(chunk, (chunk_x * size + offset.x, chunk_y * size + offset.y))
+                    blits += 1
+        profiler.count('blits', blits)
 
 class AllSprites(pygame.sprite.Group):
     def __init__(self):
         super().__init__()
         self.display_surface = pygame.display.get_surface()
         self.offset = pygame.Vector2()
-    
+        self.ground = None
+        self.swarm = None
+
+        # depth order, kept sorted by rect.centery between frames
+        self.depth_keys = []
+        self.depth_sprites = []
+        self.depths = {}
+        self.moving_sprites = {}
+        self.pending_sprites = {}
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        # sprites join their groups before their rect exists, so sort them in on the next draw
+        self.pending_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.pending_sprites.pop(sprite, None)
+        self.moving_sprites.pop(sprite, None)
+        if sprite in self.depths:
+            self.remove_depth(sprite, self.depths.pop(sprite))
+
+    def empty(self):
+        self.depth_keys.clear()
+        self.depth_sprites.clear()
+        self.depths.clear()
+        self.moving_sprites.clear()
+        self.pending_sprites.clear()
+        super().empty()
+
+    def insert_depth(self, sprite, depth):
+        index = bisect_right(self.depth_keys, depth)
+        self.depth_keys.insert(index, depth)
+        self.depth_sprites.insert(index, sprite)
+        self.depths[sprite] = depth
+
+    def remove_depth(self, sprite, depth):
+        index = bisect_left(self.depth_keys, depth)
+        while self.depth_sprites[index] is not sprite:
+            index += 1
+        del self.depth_keys[index]
+        del self.depth_sprites[index]
+
+    def sort_sprites(self):
+        for sprite in self.pending_sprites:
+            self.insert_depth(sprite, sprite.rect.centery)
+            if not getattr(sprite, 'static', False):
+                self.moving_sprites[sprite] = sprite.rect.centery
+        self.pending_sprites.clear()
+
+        for sprite, depth in self.moving_sprites.items():
+            if sprite.rect.centery != depth:
+                self.remove_depth(sprite, depth)
+                self.insert_depth(sprite, sprite.rect.centery)
+                self.moving_sprites[sprite] = sprite.rect.centery
+
     def draw(self, target_pos):
         self.offset.x = -(target_pos[0] - WINDOW_WIDTH / 2)
         self.offset.y = -(target_pos[1] - WINDOW_HEIGHT / 2)
+        camera_rect = pygame.Rect(-self.offset.x, -self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        if self.ground:
+            self.ground.draw(self.display_surface, self.offset)
 
-        ground_sprites = [sprite for sprite in self if hasattr(sprite, 'ground')] 
-        object_sprites = [sprite for sprite in self if not hasattr(sprite, 'ground')] 
-        
-        for layer in [ground_sprites, object_sprites]:
-            for sprite in sorted(layer, key = lambda sprite: sprite.rect.centery):
-                self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
\ No newline at end of file
+        self.sort_sprites()
+        blits = 0
+        if self.swarm is not None:
+            sprites = ((sprite.rect.centery, sprite.image, sprite.rect.topleft) for sprite in self.depth_sprites if camera_rect.colliderect(sprite.rect))
+            for _, image, topleft in merge(sprites, self.swarm.visible(camera_rect), key = lambda entry: entry[0]):
+                self.display_surface.blit(image, topleft + self.offset)
+                blits += 1
+        else:
+            for sprite in self.depth_sprites:
+                if camera_rect.colliderect(sprite.rect):
+                    self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
+                    blits += 1
+        profiler.count('blits', blits)
\ No newline at end of file
@@ -0,0 +1,172 @@
+from settings import *
+import os
+import pickle
+import xml.etree.ElementTree as ElementTree
+from threading import Thread
+from time import perf_counter
+from pytmx import TiledMap
+from pytmx.util_pygame import handle_transformation
+from groups import GroundLayer
+from sprites import CollisionSprite
+from spatial import SpatialHash
+
+LEVEL_CACHE_VERSION = 2
+
+class Level:
+    # a loaded map; reset() starts every game from this instead of reparsing the TMX
+    def __init__(self, size, ground, entities):
+        self.size = size
+        self.entities = entities
+        # the static world, nothing moves or changes it in play so every game shares it
+        self.baked_ground = GroundLayer(ground)
+        self.sprites = []
+        self.collision_grid = SpatialHash(TILE_SIZE)
+
+def parse_level(path):
+    # pytmx, recording every file it reads so the compiled form can be checked against them;
+    # tiles stay unconverted with the format pytmx would have picked, so this runs off the main thread
+    sources = [path]
+    surfaces, indices = [], {}
+    def image_loader(filename, colorkey, **kwargs):
+        sources.append(filename)
+        colorkey = tuple(pygame.Color('#' + colorkey)) if colorkey else None
+        image = pygame.image.load(filename)
+        def load_tile(rect = None, flags = None):
+            tile = image.subsurface(rect) if rect else image.copy()
+            if flags:
+                tile = handle_transformation(tile, flags)
+            alpha = not colorkey and pygame.mask.from_surface(tile, 254).count() < tile.get_width() * tile.get_height()
+            indices[tile] = len(surfaces)
+            surfaces.append((tile, alpha, colorkey))
+            return tile
+        return load_tile
+    tiled_map = TiledMap(path, image_loader = image_loader)
+    for node in ElementTree.parse(path).getroot().iter('tileset'):
+        if node.get('source'):
+            sources.append(os.path.normpath(os.path.join(os.path.dirname(path), node.get('source'))))
+
+    data = {
+        'size': (tiled_map.width, tiled_map.height),
+        'ground': [(x, y, indices[surf]) for x, y, surf in tiled_map.get_layer_by_name('Ground').tiles()],
+        'objects': [((obj.x, obj.y), indices[obj.image]) for obj in tiled_map.get_layer_by_name('Objects')],
+        'collisions': [(obj.x, obj.y, obj.width, obj.height) for obj in tiled_map.get_layer_by_name('Collisions')],
+        'entities': [(obj.name, (obj.x, obj.y)) for obj in tiled_map.get_layer_by_name('Entities')],
+        'surfaces': surfaces,
+    }
+    return data, sources
+
+def source_times(sources):
+    return {source: os.path.getmtime(source) for source in sources}
+
+def cache_path(path):
+    return os.path.join(os.path.dirname(os.path.dirname(path)), 'cache', os.path.basename(path) + '.level')
+
+def write_cache(path, data, sources):
+    # surfaces are stored once each as raw pixels, the tables refer to them by index
+    surfaces = [(pygame.image.tobytes(surf, 'RGBA' if alpha else 'RGB'), surf.get_size(), alpha, colorkey) for surf, alpha, colorkey in data['surfaces']]
+    try:
+        os.makedirs(os.path.dirname(cache_path(path)), exist_ok = True)
+        with open(cache_path(path), 'wb') as f:
+            pickle.dump(dict(data, version = LEVEL_CACHE_VERSION, sources = source_times(sources), surfaces = surfaces), f, pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+def read_cache(path):
+    try:
+        with open(cache_path(path), 'rb') as f:
+            data = pickle.load(f)
+        if data['version'] != LEVEL_CACHE_VERSION or data['sources'] != source_times(data['sources']):
+            return None
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        return None
+    data['surfaces'] = [(pygame.image.frombytes(pixels, size, 'RGBA' if alpha else 'RGB'), alpha, colorkey) for pixels, size, alpha, colorkey in data['surfaces']]
+    return data
+
+def prepare_level(path):
+    # the compiled form on disk, else the TMX itself; nothing here touches the display
+    data = read_cache(path)
+    if data is None:
+        data, sources = parse_level(path)
+        write_cache(path, data, sources)
+    return data
+
+def convert(surf, alpha, colorkey):
+    if alpha:
+        return surf.convert_alpha()
+    surf = surf.convert()
+    surf.set_colorkey(colorkey)
+    return surf
+
+class LevelLoader:
+    # a worker thread reads and decodes the map, then step() converts surfaces and bakes
+    # the ground on the main thread a few at a time, within the time it is given
+    def __init__(self, path):
+        self.path = path
+        self.level = levels.get(path)
+        self.data = None
+        self.error = None
+        self.progress = 1 if self.level else 0
+        self.work = self.build()
+        if not self.level:
+            self.worker = Thread(target = self.prepare, daemon = True)
+            self.worker.start()
+
+    @property
+    def done(self):
+        return self.level is not None
+
+    def prepare(self):
+        try:
+            self.data = prepare_level(self.path)
+        except Exception as error:
+            self.error = error
+
+    def build(self):
+        # yields the fraction done after each surface, ground chunk and collider
+        data = self.data
+        surfaces = []
+        for surf, alpha, colorkey in data['surfaces']:
+            surfaces.append(convert(surf, alpha, colorkey))
+            yield len(surfaces) / len(data['surfaces']) / 3
+        # the raw tables live only as long as the build, the level keeps what was made from them
+        self.data = None
+        level = Level(data['size'], [(x, y, surfaces[index]) for x, y, index in data['ground']], data['entities'])
+        chunks = len(level.baked_ground.pending)
+        while not level.baked_ground.bake(1):
+            yield (2 - len(level.baked_ground.pending) / chunks) / 3
+        objects = [(pos, surfaces[index]) for pos, index in data['objects']]
+        collisions = [pygame.Rect(rect) for rect in data['collisions']]
+        colliders = len(objects) + len(collisions)
+        for pos, surf in objects:
+            sprite = CollisionSprite(pos, surf, ())
+            level.sprites.append(sprite)
+            level.collision_grid.insert(sprite.rect)
+            yield (2 + len(level.collision_grid.items) / colliders) / 3
+        for rect in collisions:
+            level.collision_grid.insert(rect)
+            yield (2 + len(level.collision_grid.items) / colliders) / 3
+        levels[self.path] = level
+        self.level = level
+
+    def step(self, budget = LOAD_SLICE):
+        # returns True once the level is ready
+        if self.level:
+            return True
+        if self.worker.is_alive():
+            return False
+        if self.error:
+            raise self.error
+        deadline = perf_counter() + budget / 1000
+        for self.progress in self.work:
+            if perf_counter() >= deadline:
+                return False
+        self.progress = 1
+        return True
+
+    def finish(self):
+        if not self.level:
+            self.worker.join()
+            self.step(float('inf'))
+        return self.level
+
+levels = {}
@@ -1,207 +1,396 @@
-import json
+import argparse
 import os
+from time import perf_counter
 from settings import *
 from player import Player
 from sprites import *
-from pytmx.util_pygame import load_pygame
+from level import LevelLoader
+from assets import get_mask, get_silhouette
+from atlas import load_atlas, load_background
+from text import render_text, Label
+from scheduler import FrameScheduler
 from groups import AllSprites
-from random import randint, choice
+from pool import Pool
+from scores import ScoreStore
+from audio import AudioManager
+from profiler import profiler
+from recording import Recorder
+from director import SpawnDirector
+from spatial import SpatialHash
+from flowfield import FlowField
+from controls import controls
+from timing import game_clock
+from random import Random
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 game_dir = os.path.dirname(script_dir)
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless = False, fixed_dt = None, seed = None, record_path = None):
+        # headless runs on the SDL dummy drivers and takes its input from a script through controls
+        self.headless = headless
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        self.fixed_dt = fixed_dt
+        self.seed = seed
+        self.random = Random(seed)
+        self.record_path = record_path
+        self.recorder = None
+        self.swarm_mode = SWARM_MODE
         pygame.init()
         self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption('Vampire: The Hunter')
-        self.clock = pygame.time.Clock()
+        self.scheduler = FrameScheduler(FPS)
+        self.shown_state = None
+        self.paused_frame = None
+        self.name_rect = None
+        self.game_over_time = 0
         self.running = True
         self.state = 'MENU'
         self.score = 0
         self.player_name = ''
-        self.high_scores = []
-        self.load_highscores()
+        self.scores = ScoreStore(os.path.join(game_dir, 'highscores.json'))
         self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
+        self.collision_grid = SpatialHash(TILE_SIZE)
+        self.combat_grid = SpatialHash(COMBAT_CELL_SIZE)
         self.bullet_sprites = pygame.sprite.Group()
         self.enemy_sprites = pygame.sprite.Group()
+        self.bullet_pool = Pool(Bullet)
+        self.enemy_pool = Pool(Enemy)
         self.can_shoot = True
         self.shoot_time = 0
         self.gun_cooldown = 250
-        self.enemy_event = pygame.event.custom_type()
-        pygame.time.set_timer(self.enemy_event, 1000)
         self.spawn_positions = []
-        self.shoot_sound = pygame.mixer.Sound(os.path.join(game_dir, 'audio', 'shoot.wav'))
-        self.shoot_sound.set_volume(0.2)
-        self.impact_sound = pygame.mixer.Sound(os.path.join(game_dir, 'audio', 'impact.ogg'))
-        self.hurt_sound = pygame.mixer.Sound(os.path.join(game_dir, 'audio', 'hurt.wav'))
-        self.music = pygame.mixer.Sound(os.path.join(game_dir, 'audio', 'music.wav'))
-        self.music.set_volume(0.5)
+        # a fixed step means a scripted or replayed run, which must not depend on how fast frames are
+        self.director = SpawnDirector(self.random, adaptive = fixed_dt is None)
+        self.audio = AudioManager(os.path.join(game_dir, 'audio'))
+        self.audio.register('shoot', 'shoot.wav', volume = 0.2, voices = 3, priority = 1)
+        self.audio.register('impact', 'impact.ogg', voices = 4, priority = 0)
+        self.audio.register('hurt', 'hurt.wav', voices = 1, priority = 2)
+        self.score_label = Label('Score: {}', 40)
         self.load_images()
-        self.setup()
-
-    def load_highscores(self):
-        try:
-            with open(os.path.join(game_dir, 'highscores.json'), 'r') as f:
-                self.high_scores = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.high_scores = []
-
-    def save_highscores(self):
-        with open(os.path.join(game_dir, 'highscores.json'), 'w') as f:
-            json.dump(self.high_scores, f, indent=4)
+        # the map loads while the menu is up, Start waits for it only if it is not ready yet
+        self.level_loader = LevelLoader(os.path.join(game_dir, 'data', 'maps', 'world.tmx'))
 
     def load_images(self):
-        self.bullet_surf = pygame.image.load(os.path.join(game_dir, 'images', 'gun', 'bullet.png')).convert_alpha()
-        self.heart_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'heart.png')).convert_alpha()
-        self.heart_surf = pygame.transform.rotozoom(self.heart_surf, 0, 0.05)
-        self.logo_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'logo.png')).convert_alpha()
-        self.logo_surf = pygame.transform.rotozoom(self.logo_surf, 0, 0.5)
-        self.start_button_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'start.png')).convert_alpha()
-        self.start_button_surf = pygame.transform.rotozoom(self.start_button_surf, 0, 0.2)
-        self.quit_button_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'quit.png')).convert_alpha()
-        self.quit_button_surf = pygame.transform.rotozoom(self.quit_button_surf, 0, 0.2)
-        self.menu_background_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'menu_background.png')).convert()
-        self.menu_background_surf = pygame.transform.scale(self.menu_background_surf, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.game_over_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'gameover.png')).convert_alpha()
-        self.game_over_surf = pygame.transform.scale(self.game_over_surf, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.main_menu_button_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'main_menu.png')).convert_alpha()
-        self.main_menu_button_surf = pygame.transform.rotozoom(self.main_menu_button_surf, 0, 0.2)
-        self.paused_surf = pygame.image.load(os.path.join(game_dir, 'images', 'ui', 'paused.png')).convert_alpha()
-        folders = list(walk(os.path.join(game_dir, 'images', 'enemies')))[0][1]
-        self.enemy_frames = {}
-        for folder in folders:
-            for folder_path, _, file_names in walk(os.path.join(game_dir, 'images', 'enemies', folder)):
-                self.enemy_frames[folder] = []
-                for file_name in sorted(file_names, key = lambda name: int(name.split('.')[0])):
-                    full_path = os.path.join(folder_path, file_name)
-                    surf = pygame.image.load(full_path).convert_alpha()
-                    self.enemy_frames[folder].append(surf)
+        self.bullet_surf = load_atlas('gun').frame('bullet')
+        self.bullet_mask = get_mask(self.bullet_surf)
+        # ui art comes pre-scaled to its display size
+        ui = load_atlas('ui')
+        self.heart_surf = ui.frame('heart')
+        self.logo_surf = ui.frame('logo')
+        self.start_button_surf = ui.frame('start')
+        self.quit_button_surf = ui.frame('quit')
+        self.menu_background_surf = load_background('menu_background')
+        self.game_over_surf = load_background('gameover')
+        self.main_menu_button_surf = ui.frame('main_menu')
+        self.paused_surf = ui.frame('paused')
+        self.pause_overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+        self.pause_overlay.fill((0, 0, 0, 150))
+        self.enemy_frames = load_atlas('enemies').frames
+        self.enemy_masks = {}
+        self.enemy_silhouettes = {}
+        for enemy_type, frames in self.enemy_frames.items():
+            self.enemy_masks[enemy_type] = [get_mask(surf) for surf in frames]
+            self.enemy_silhouettes[enemy_type] = get_silhouette(frames[0])
+        # Player picks these up from the caches, so starting a game loads nothing
+        for frames in load_atlas('player').frames.values():
+            for surf in frames:
+                get_mask(surf)
 
     def setup(self):
-        map = load_pygame(os.path.join(game_dir, 'data', 'maps', 'world.tmx'))
-        for x, y, image in map.get_layer_by_name('Ground').tiles():
-            Sprite((x * TILE_SIZE,y * TILE_SIZE), image, self.all_sprites)
-        for obj in map.get_layer_by_name('Objects'):
-            CollisionSprite((obj.x, obj.y), obj.image, (self.all_sprites, self.collision_sprites))
-        for obj in map.get_layer_by_name('Collisions'):
-            CollisionSprite((obj.x, obj.y), pygame.Surface((obj.width, obj.height)), self.collision_sprites)
-        for obj in map.get_layer_by_name('Entities'):
-            if obj.name == 'Player':
-                self.player = Player((obj.x,obj.y), self.all_sprites, self.collision_sprites, self.hurt_sound)
+        level = self.level_loader.finish()
+        columns, rows = level.size
+        self.all_sprites.ground = level.baked_ground
+        self.all_sprites.add(level.sprites)
+        self.collision_grid = level.collision_grid
+        self.spawn_positions = []
+        for name, pos in level.entities:
+            if name == 'Player':
+                self.player = Player(pos, self.all_sprites, self.collision_grid, self.audio)
                 self.gun = Gun(self.player, self.all_sprites)
             else:
-                self.spawn_positions.append((obj.x, obj.y))
+                self.spawn_positions.append(pos)
+        self.flow_field = None
+        if FLOW_FIELD:
+            # clear the path for the smallest enemy hitbox, larger ones still slide along the colliders
+            clearance = min(frames[0].get_width() for frames in self.enemy_frames.values()) - 20, min(frames[0].get_height() for frames in self.enemy_frames.values()) - 40
+            self.flow_field = FlowField(columns, rows, self.collision_grid.items, clearance)
+        self.swarm = None
+        if self.swarm_mode:
+            from swarm import Swarm
+            map_size = (columns * TILE_SIZE, rows * TILE_SIZE)
+            self.swarm = Swarm(self.enemy_frames, self.enemy_masks, self.collision_grid.items, map_size)
+        self.all_sprites.swarm = self.swarm
     
     def reset(self):
+        self.bullet_pool.release_all(self.bullet_sprites)
+        self.enemy_pool.release_all(self.enemy_sprites)
         self.all_sprites.empty()
-        self.collision_sprites.empty()
-        self.bullet_sprites.empty()
-        self.enemy_sprites.empty()
         self.score = 0
         self.player_name = ''
+        self.can_shoot = True
+        self.shoot_time = 0
+        game_clock.reset()
         self.setup()
+        self.director.reset(self.spawn_positions, self.enemy_frames)
 
     def input(self):
-        if pygame.mouse.get_pressed()[0] and self.can_shoot:
-            self.shoot_sound.play()
+        if controls.mouse_buttons[0] and self.can_shoot:
+            self.audio.play('shoot')
             pos = self.gun.rect.center + self.gun.player_direction * 50
-            Bullet(self.bullet_surf, pos, self.gun.player_direction, (self.all_sprites, self.bullet_sprites))
+            self.bullet_pool.acquire((self.all_sprites, self.bullet_sprites), self.bullet_surf, self.bullet_mask, pos, self.gun.player_direction)
             self.can_shoot = False
-            self.shoot_time = pygame.time.get_ticks()
+            self.shoot_time = game_clock.get_ticks()
 
     def gun_timer(self):
         if not self.can_shoot:
-            current_time = pygame.time.get_ticks()
+            current_time = game_clock.get_ticks()
             if current_time - self.shoot_time >= self.gun_cooldown:
                 self.can_shoot = True
+
+    def enemy_count(self):
+        return len(self.enemy_sprites) + (len(self.swarm) if self.swarm is not None else 0)
+
+    def spawn_director(self):
+        for pos, enemy_type, strength in self.director.update(game_clock.get_ticks(), self.enemy_count()):
+            self.spawn_enemy(pos, enemy_type, strength)
+        excess = self.director.excess(self.enemy_count())
+        if excess:
+            self.director.backlog += self.despawn_far_enemies(excess)
+
+    def despawn_far_enemies(self, count):
+        # only enemies well outside the screen go, farthest first; returns the strength they carried
+        far_rect = pygame.Rect(0, 0, WINDOW_WIDTH + DESPAWN_MARGIN * 2, WINDOW_HEIGHT + DESPAWN_MARGIN * 2)
+        far_rect.center = self.player.rect.center
+        center = pygame.Vector2(far_rect.center)
+        enemies = [enemy for enemy in self.enemy_sprites if enemy.death_time == 0 and not far_rect.collidepoint(enemy.rect.center)]
+        enemies.sort(key = lambda enemy: center.distance_squared_to(enemy.rect.center), reverse = True)
+        strength = 0
+        for enemy in enemies[:count]:
+            strength += enemy.health
+            enemy.recycle()
+        if self.swarm is not None and count > len(enemies):
+            strength += self.swarm.despawn(self.swarm.far(far_rect)[:count - len(enemies)])
+        return strength
                 
-    def run_menu(self):
-        self.display_surface.blit(self.menu_background_surf, (0,0))
-        font_score = pygame.font.Font(None, 40)
-        
-        logo_rect = self.logo_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 4))
-        self.display_surface.blit(self.logo_surf, logo_rect)
+    def spawn_enemy(self, pos, enemy_type, strength = 1):
+        if self.swarm is not None:
+            self.swarm.spawn(pos, enemy_type, strength)
+        else:
+            self.enemy_pool.acquire((self.all_sprites, self.enemy_sprites), pos, self.enemy_frames[enemy_type], self.enemy_masks[enemy_type],
+                                    self.enemy_silhouettes[enemy_type], self.player, self.collision_grid, self.flow_field, strength)
+
+    def pool_stats(self):
+        return {'bullets': self.bullet_pool.stats(), 'enemies': self.enemy_pool.stats()}
+
+    def collide_enemies(self, sprite):
+        # broadphase cells, then rects, then the cached masks
+        candidates = self.combat_grid.query(sprite.rect)
+        profiler.count('collision_tests', len(candidates))
+        return [enemy for enemy in candidates
+                if sprite.rect.colliderect(enemy.rect) and pygame.sprite.collide_mask(sprite, enemy)]
 
+    def combat_collisions(self):
+        with profiler.scope('collision'):
+            self.combat_grid.clear()
+            for enemy in self.enemy_sprites:
+                self.combat_grid.insert(enemy.rect, enemy)
+
+            with profiler.scope('bullets'):
+                for bullet in self.bullet_sprites:
+                    collision_sprites = self.collide_enemies(bullet)
+                    swarm_hits = self.swarm.collide(bullet) if self.swarm is not None else []
+                    if collision_sprites or swarm_hits:
+                        self.audio.play('impact')
+                        for sprite in collision_sprites:
+                            sprite.hit()
+                            self.score += 10
+                        if swarm_hits:
+                            self.swarm.hit(swarm_hits)
+                            self.score += 10 * len(swarm_hits)
+                        bullet.recycle()
+            with profiler.scope('player'):
+                if self.collide_enemies(self.player) or (self.swarm is not None and self.swarm.collide(self.player)):
+                    self.player.take_damage()
+
+    def count_sprites(self):
+        profiler.count('all_sprites', len(self.all_sprites))
+        profiler.count('enemies', self.enemy_count())
+        profiler.count('bullets', len(self.bullet_sprites))
+
+    def run_menu(self):
         start_button_rect = self.start_button_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
         quit_button_rect = self.quit_button_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 80))
-        self.display_surface.blit(self.start_button_surf, start_button_rect)
-        self.display_surface.blit(self.quit_button_surf, quit_button_rect)
-        
-        score_title_text = pygame.font.Font(None, 50).render('High Scores', True, (245, 245, 245))
-        score_title_rect = score_title_text.get_rect(topright=(WINDOW_WIDTH - 20, WINDOW_HEIGHT - 150))
-        self.display_surface.blit(score_title_text, score_title_rect)
-
-        for i, score_entry in enumerate(self.high_scores[:3]):
-            score_text = f"{i+1}. {score_entry['name']} - {score_entry['score']}"
-            score_surf = font_score.render(score_text, True, (245, 245, 245))
-            score_rect = score_surf.get_rect(topleft=(score_title_rect.left, WINDOW_HEIGHT - 100 + i * 30))
-            self.display_surface.blit(score_surf, score_rect)
 
-        for event in pygame.event.get():
+        if self.scheduler.full_redraw:
+            self.display_surface.blit(self.menu_background_surf, (0,0))
+
+            logo_rect = self.logo_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 4))
+            self.display_surface.blit(self.logo_surf, logo_rect)
+
+            self.display_surface.blit(self.start_button_surf, start_button_rect)
+            self.display_surface.blit(self.quit_button_surf, quit_button_rect)
+
+            score_title_text = render_text('High Scores', 50, (245, 245, 245))
+            score_title_rect = score_title_text.get_rect(topright=(WINDOW_WIDTH - 20, WINDOW_HEIGHT - 150))
+            self.display_surface.blit(score_title_text, score_title_rect)
+
+            for i, score_entry in enumerate(self.scores.top(3)):
+                score_text = f"{i+1}. {score_entry['name']} - {score_entry['score']}"
+                score_surf = render_text(score_text, 40, (245, 245, 245))
+                score_rect = score_surf.get_rect(topleft=(score_title_rect.left, WINDOW_HEIGHT - 100 + i * 30))
+                self.display_surface.blit(score_surf, score_rect)
+        self.scheduler.present()
+
+        # keep loading between events until the map is ready
+        loaded = self.level_loader.step()
+        for event in self.scheduler.wait(IDLE_TIMEOUT if loaded else 1):
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if start_button_rect.collidepoint(event.pos):
-                    self.reset()
-                    self.state = 'PLAYING'
+                    if self.level_loader.step():
+                        self.start_game()
+                    else:
+                        self.state = 'LOADING'
                 if quit_button_rect.collidepoint(event.pos):
                     self.running = False
-        
-        pygame.display.update()
 
-    def run_game(self):
-        dt = self.clock.tick() / 1000
+    def run_loading(self):
+        self.scheduler.tick()
+        # the player is waiting on the bar now, so loading gets all but a menu slice of the frame
+        if self.level_loader.step(1000 / FPS - LOAD_SLICE):
+            self.start_game()
+            return
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.state = 'PAUSED'
-            if event.type == self.enemy_event:
-                Enemy(choice(self.spawn_positions), choice(list(self.enemy_frames.values())), (self.all_sprites, self.enemy_sprites), self.player, self.collision_sprites)
-        self.gun_timer()
-        self.input()
-        self.all_sprites.update(dt)
-        if self.bullet_sprites:
-            for bullet in self.bullet_sprites:
-                collision_sprites = pygame.sprite.spritecollide(bullet, self.enemy_sprites, False, pygame.sprite.collide_mask)
-                if collision_sprites:
-                    self.impact_sound.play()
-                    for sprite in collision_sprites:
-                        sprite.destroy()
-                        self.score += 10
-                    bullet.kill()
-        if pygame.sprite.spritecollide(self.player, self.enemy_sprites, False, pygame.sprite.collide_mask):
-            self.player.take_damage()
+
+        bar_rect = pygame.Rect(0, 0, 400, 20)
+        bar_rect.center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 20)
+        if self.scheduler.full_redraw:
+            self.display_surface.blit(self.menu_background_surf, (0,0))
+            loading_surf = render_text('LOADING', 60)
+            self.display_surface.blit(loading_surf, loading_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 40)))
+            pygame.draw.rect(self.display_surface, (245, 245, 245), bar_rect, 2)
+        pygame.draw.rect(self.display_surface, (245, 245, 245), (bar_rect.x, bar_rect.y, bar_rect.width * self.level_loader.progress, bar_rect.height))
+        self.scheduler.invalidate(bar_rect)
+        self.scheduler.present()
+
+    def start_game(self):
+        self.reset()
+        if self.record_path:
+            self.start_recording()
+        self.state = 'PLAYING'
+
+    def update(self, dt):
+        with profiler.scope('update'):
+            game_clock.advance(dt)
+            with profiler.scope('spawn'):
+                self.spawn_director()
+            self.gun_timer()
+            self.input()
+            if self.flow_field:
+                with profiler.scope('flow_field'):
+                    self.flow_field.update(self.player.hitbox_rect.center)
+            with profiler.scope('sprites'):
+                self.all_sprites.update(dt)
+            if self.swarm is not None:
+                with profiler.scope('swarm'):
+                    self.swarm.update(dt, self.player.rect.center, self.flow_field)
+
+    def step(self, dt):
+        self.update(dt)
+        self.combat_collisions()
         if self.player.health <= 0:
             self.state = 'GAME_OVER'
-        self.display_surface.fill('black')
-        self.all_sprites.draw(self.player.rect.center)
-        for i in range(self.player.health):
-            x = 10 + i * (self.heart_surf.get_width() + 4)
-            y = 10
-            self.display_surface.blit(self.heart_surf, (x, y))
-        font = pygame.font.Font(None, 40)
-        score_text = f"Score: {self.score}"
-        score_surf = font.render(score_text, True, (255, 255, 255))
-        score_rect = score_surf.get_rect(topright=(WINDOW_WIDTH - 20, 10))
-        self.display_surface.blit(score_surf, score_rect)
-        pygame.display.update()
 
-    def run_pause_menu(self):
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150))
-        self.display_surface.blit(overlay, (0, 0))
+    def draw(self):
+        with profiler.scope('draw'):
+            with profiler.scope('world'):
+                self.display_surface.fill('black')
+                self.all_sprites.draw(self.player.rect.center)
+            with profiler.scope('hud'):
+                for i in range(self.player.health):
+                    x = 10 + i * (self.heart_surf.get_width() + 4)
+                    y = 10
+                    self.display_surface.blit(self.heart_surf, (x, y))
+                score_surf = self.score_label.render(self.score)
+                score_rect = score_surf.get_rect(topright=(WINDOW_WIDTH - 20, 10))
+                self.display_surface.blit(score_surf, score_rect)
+                if profiler.overlay:
+                    profiler.draw(self.display_surface)
+            with profiler.scope('present'):
+                pygame.display.update()
+
+    def start_recording(self):
+        # only the next game is recorded, with a seed the replay can restore; any int seed is
+        # folded into the header's unsigned 64 bits and the game reseeded with what is stored
+        seed = self.seed % 2 ** 64 if self.seed is not None else Random().randrange(2 ** 32)
+        self.random.seed(seed)
+        self.recorder = Recorder(self.record_path, seed, self.fixed_dt, self.swarm_mode)
+        self.record_path = None
 
-        paused_rect = self.paused_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 50))
-        self.display_surface.blit(self.paused_surf, paused_rect)
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def toggle_trace(self):
+        if profiler.tracing:
+            profiler.save_trace(os.path.join(game_dir, 'trace.json'))
+            profiler.enabled = profiler.overlay
+        else:
+            profiler.enabled = True
+            profiler.start_trace()
+
+    def run_game(self):
+        frame_time = self.scheduler.tick(uncapped = self.headless)
+        dt = self.fixed_dt if self.fixed_dt else frame_time
+        start = perf_counter()
+        with profiler.scope('frame'):
+            with profiler.scope('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.running = False
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            self.state = 'PAUSED'
+                        if event.key == pygame.K_F3:
+                            profiler.toggle_overlay()
+                        if event.key == pygame.K_F4:
+                            self.toggle_trace()
+                    if event.type == pygame.WINDOWMINIMIZED:
+                        self.state = 'PAUSED'
+                if not self.headless:
+                    controls.poll()
+            if self.recorder:
+                self.recorder.record(controls, dt, self.director.cap)
+            self.step(dt)
+            self.draw()
+        self.director.record_frame((perf_counter() - start) * 1000, self.enemy_count())
+        if profiler.enabled:
+            self.count_sprites()
+        profiler.end_frame()
 
+    def run_pause_menu(self):
         main_menu_button_rect = self.main_menu_button_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 50))
-        self.display_surface.blit(self.main_menu_button_surf, main_menu_button_rect)
 
-        for event in pygame.event.get():
+        if self.scheduler.full_redraw:
+            # darken the last game frame once, redraws reuse it
+            if self.paused_frame is None:
+                self.paused_frame = self.display_surface.copy()
+                self.paused_frame.blit(self.pause_overlay, (0, 0))
+            self.display_surface.blit(self.paused_frame, (0, 0))
+
+            paused_rect = self.paused_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 50))
+            self.display_surface.blit(self.paused_surf, paused_rect)
+            self.display_surface.blit(self.main_menu_button_surf, main_menu_button_rect)
+        self.scheduler.present()
+
+        for event in self.scheduler.wait():
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.KEYDOWN:
@@ -210,44 +399,72 @@ class Game:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if main_menu_button_rect.collidepoint(event.pos):
                     self.state = 'MENU'
-        pygame.display.update()
 
     def show_game_over(self):
-        self.display_surface.fill('black')
-        self.display_surface.blit(self.game_over_surf, (0,0))
-        pygame.display.update()
-        pygame.time.wait(2000)
-        self.state = 'ENTER_NAME'
+        if self.scheduler.full_redraw:
+            self.display_surface.blit(self.game_over_surf, (0,0))
+        self.scheduler.present()
+
+        remaining = 2000 - (pygame.time.get_ticks() - self.game_over_time)
+        if remaining <= 0:
+            self.state = 'ENTER_NAME'
+            return
+        for event in self.scheduler.wait(remaining):
+            if event.type == pygame.QUIT:
+                self.running = False
+
+    def draw_name(self):
+        # only the name's old and new area go to the display
+        if self.name_rect:
+            self.display_surface.fill('black', self.name_rect)
+            self.scheduler.invalidate(self.name_rect)
+        name_surf = render_text(self.player_name, 80)
+        self.name_rect = name_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
+        self.display_surface.blit(name_surf, self.name_rect)
+        self.scheduler.invalidate(self.name_rect)
 
     def run_name_input(self):
-        self.display_surface.fill('black')
-        font_prompt = pygame.font.Font(None, 60)
-        font_name = pygame.font.Font(None, 80)
-        prompt_text = f"Your Score: {self.score}. Enter your name (4 chars):"
-        prompt_surf = font_prompt.render(prompt_text, True, (255, 255, 255))
-        prompt_rect = prompt_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 100))
-        self.display_surface.blit(prompt_surf, prompt_rect)
-        name_surf = font_name.render(self.player_name, True, (255, 255, 255))
-        name_rect = name_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
-        self.display_surface.blit(name_surf, name_rect)
-        for event in pygame.event.get():
+        if self.scheduler.full_redraw:
+            self.display_surface.fill('black')
+            prompt_text = f"Your Score: {self.score}. Enter your name (4 chars):"
+            prompt_surf = render_text(prompt_text, 60)
+            prompt_rect = prompt_surf.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 100))
+            self.display_surface.blit(prompt_surf, prompt_rect)
+            self.name_rect = None
+            self.draw_name()
+        self.scheduler.present()
+
+        for event in self.scheduler.wait():
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN:
                     if len(self.player_name) > 0:
-                        self.high_scores.append({'name': self.player_name, 'score': self.score})
-                        self.high_scores = sorted(self.high_scores, key=lambda x: x['score'], reverse=True)
-                        self.save_highscores()
+                        self.scores.add(self.player_name, self.score)
                         self.state = 'MENU'
                 elif event.key == pygame.K_BACKSPACE:
                     self.player_name = self.player_name[:-1]
+                    self.draw_name()
                 elif len(self.player_name) < 4 and event.unicode.isalnum():
                     self.player_name += event.unicode
-        pygame.display.update()
+                    self.draw_name()
+
+    def enter_state(self):
+        # every state starts from a full redraw
+        self.shown_state = self.state
+        self.scheduler.invalidate()
+        if self.state != 'PAUSED':
+            self.paused_frame = None
+        if self.state == 'GAME_OVER':
+            self.game_over_time = pygame.time.get_ticks()
+        if self.state in ('MENU', 'GAME_OVER'):
+            self.stop_recording()
 
     def run(self):
+        self.audio.play_music('music.wav', 0.5)
         while self.running:
+            if self.state != self.shown_state:
+                self.enter_state()
             if self.state == 'MENU':
                 self.run_menu()
             elif self.state == 'PLAYING':
@@ -256,10 +473,21 @@ class Game:
                 self.run_pause_menu()
             elif self.state == 'GAME_OVER':
                 self.show_game_over()
+            elif self.state == 'LOADING':
+                self.run_loading()
             elif self.state == 'ENTER_NAME':
                 self.run_name_input()
+        if profiler.tracing:
+            profiler.save_trace(os.path.join(game_dir, 'trace.json'))
+        self.stop_recording()
+        self.scores.close()
+        self.audio.stop_music()
         pygame.quit()
 
 if __name__ == '__main__':
-    game = Game()
+    parser = argparse.ArgumentParser(description = 'Vampire: The Hunter')
+    parser.add_argument('--record', metavar = 'PATH', help = 'record the input of the next game played to PATH, for replay.py')
+    parser.add_argument('--seed', type = int, help = 'seed for enemy spawns')
+    args = parser.parse_args()
+    game = Game(seed = args.seed, record_path = args.record and os.path.abspath(args.record))
     game.run()
@@ -1,34 +1,34 @@
 from settings import *
+from assets import get_mask
+from atlas import load_atlas
+from controls import controls
+from timing import game_clock
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self, pos, groups, collision_sprites, hurt_sound):
+    def __init__(self, pos, groups, collision_grid, audio):
         super().__init__(groups)
         self.load_images()
         self.state, self.frame_index = 'right', 0
-        self.image = pygame.image.load(join('images', 'player', 'down', '0.png')).convert_alpha()
+        self.image = self.frames['down'][0]
+        self.mask = get_mask(self.image)
         self.rect = self.image.get_rect(center = pos)
         self.hitbox_rect = self.rect.inflate(-60, -90)
         self.direction = pygame.Vector2()
         self.speed = 500
-        self.collision_sprites = collision_sprites
+        self.collision_grid = collision_grid
         self.health = 5
         self.invincible = False
         self.invincibility_duration = 2000
         self.hurt_time = 0
-        self.hurt_sound = hurt_sound
+        self.audio = audio
 
     def load_images(self):
-        self.frames = {'left': [], 'right': [], 'up': [], 'down': []}
-        for state in self.frames.keys():
-            for folder_path, sub_folders, file_names in walk(join('images', 'player', state)):
-                if file_names:
-                    for file_name in sorted(file_names, key= lambda name: int(name.split('.')[0])):
-                        full_path = join(folder_path, file_name)
-                        surf = pygame.image.load(full_path).convert_alpha()
-                        self.frames[state].append(surf)
+        atlas = load_atlas('player')
+        self.frames = {state: atlas.frames[state] for state in ('left', 'right', 'up', 'down')}
+        self.masks = {state: [get_mask(surf) for surf in frames] for state, frames in self.frames.items()}
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = controls.keys
         self.direction.x = int(keys[pygame.K_RIGHT] or keys[pygame.K_d]) - int(keys[pygame.K_LEFT] or keys[pygame.K_a])
         self.direction.y = int(keys[pygame.K_DOWN] or keys[pygame.K_s]) - int(keys[pygame.K_UP] or keys[pygame.K_w])
         self.direction = self.direction.normalize() if self.direction else self.direction
@@ -41,14 +41,14 @@ class Player(pygame.sprite.Sprite):
         self.rect.center = self.hitbox_rect.center
 
     def collision(self, direction):
-        for sprite in self.collision_sprites:
-            if sprite.rect.colliderect(self.hitbox_rect):
+        for rect in self.collision_grid.query(self.hitbox_rect):
+            if rect.colliderect(self.hitbox_rect):
                 if direction == 'horizontal':
-                    if self.direction.x > 0: self.hitbox_rect.right = sprite.rect.left
-                    if self.direction.x < 0: self.hitbox_rect.left = sprite.rect.right
+                    if self.direction.x > 0: self.hitbox_rect.right = rect.left
+                    if self.direction.x < 0: self.hitbox_rect.left = rect.right
                 else:
-                    if self.direction.y < 0: self.hitbox_rect.top = sprite.rect.bottom
-                    if self.direction.y > 0: self.hitbox_rect.bottom = sprite.rect.top
+                    if self.direction.y < 0: self.hitbox_rect.top = rect.bottom
+                    if self.direction.y > 0: self.hitbox_rect.bottom = rect.top
 
     def animate(self, dt):
         if self.direction.x != 0:
@@ -56,18 +56,20 @@ class Player(pygame.sprite.Sprite):
         if self.direction.y != 0:
             self.state = 'down' if self.direction.y > 0 else 'up'
         self.frame_index = self.frame_index + 5 * dt if self.direction else 0
-        self.image = self.frames[self.state][int(self.frame_index) % len(self.frames[self.state])]
+        index = int(self.frame_index) % len(self.frames[self.state])
+        self.image = self.frames[self.state][index]
+        self.mask = self.masks[self.state][index]
     
     def take_damage(self):
         if not self.invincible:
             self.health -= 1
             self.invincible = True
-            self.hurt_time = pygame.time.get_ticks()
-            self.hurt_sound.play()
+            self.hurt_time = game_clock.get_ticks()
+            self.audio.play('hurt')
 
     def invincibility_timer(self):
         if self.invincible:
-            current_time = pygame.time.get_ticks()
+            current_time = game_clock.get_ticks()
             if current_time - self.hurt_time >= self.invincibility_duration:
                 self.invincible = False
 
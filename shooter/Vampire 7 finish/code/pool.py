@@ -0,0 +1,30 @@
+class Pool:
+    # finished sprites are kept here and respawned instead of building new ones
+    def __init__(self, sprite_class):
+        self.sprite_class = sprite_class
+        self.free = []
+        self.created = 0
+        self.peak = 0
+
+    def acquire(self, groups, *args):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.spawn(*args)
+        else:
+            sprite = self.sprite_class(*args)
+            sprite.pool = self
+            self.created += 1
+        sprite.add(groups)
+        self.peak = max(self.peak, self.created - len(self.free))
+        return sprite
+
+    def release(self, sprite):
+        sprite.kill()
+        self.free.append(sprite)
+
+    def release_all(self, sprites):
+        for sprite in list(sprites):
+            self.release(sprite)
+
+    def stats(self):
+        return {'created': self.created, 'active': self.created - len(self.free), 'free': len(self.free), 'peak': self.peak}
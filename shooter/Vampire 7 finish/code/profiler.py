@@ -0,0 +1,126 @@
+from settings import *
+import json
+from collections import deque
+from time import perf_counter
+from text import Label
+
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, perf_counter())
+        return False
+
+class Profiler:
+    # named timings and counters per frame, kept for the last `history` frames;
+    # while disabled a scope is a shared no-op and counting returns at once
+    def __init__(self, history = PROFILER_HISTORY):
+        self.enabled = False
+        self.overlay = False
+        self.tracing = False
+        self.events = []
+        self.origin = perf_counter()
+        self.labels = {}
+        self.reset(history)
+
+    def reset(self, history = None):
+        self.history = history or self.history
+        self.timings = {}
+        self.counters = {}
+        self.frame_timings = {}
+        self.frame_counters = {}
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def count(self, name, amount = 1):
+        if self.enabled:
+            self.frame_counters[name] = self.frame_counters.get(name, 0) + amount
+
+    def record(self, name, start, end):
+        self.frame_timings[name] = self.frame_timings.get(name, 0) + (end - start) * 1000
+        if self.tracing:
+            self.events.append({'name': name, 'ph': 'X', 'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6, 'pid': 1, 'tid': 1})
+
+    def end_frame(self):
+        if not self.enabled:
+            # drop what was measured in the frame the overlay was switched off
+            if self.frame_timings or self.frame_counters:
+                self.frame_timings, self.frame_counters = {}, {}
+            return
+        for name, value in self.frame_timings.items():
+            if name not in self.timings:
+                self.timings[name] = deque(maxlen = self.history)
+            self.timings[name].append(value)
+        for name, value in self.frame_counters.items():
+            if name not in self.counters:
+                self.counters[name] = deque(maxlen = self.history)
+            self.counters[name].append(value)
+        if self.tracing and self.frame_counters:
+            self.events.append({'name': 'counters', 'ph': 'C', 'ts': (perf_counter() - self.origin) * 1e6, 'pid': 1, 'args': dict(self.frame_counters)})
+        self.frame_timings = {}
+        self.frame_counters = {}
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self.tracing
+
+    def mark(self, name):
+        if self.tracing:
+            self.events.append({'name': name, 'ph': 'i', 's': 'g', 'ts': (perf_counter() - self.origin) * 1e6, 'pid': 1, 'tid': 1})
+
+    def start_trace(self):
+        self.events = []
+        self.origin = perf_counter()
+        self.tracing = True
+
+    def save_trace(self, path):
+        # chrome://tracing and Perfetto both read this
+        self.tracing = False
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        self.events = []
+
+    def label(self, name):
+        if name not in self.labels:
+            self.labels[name] = Label(name + ' {}', 20)
+        return self.labels[name]
+
+    def draw(self, surface):
+        # one rolling graph per timing against the frame budget, then the latest counter values
+        budget = 1000 / FPS
+        width, height, left, top = self.history, 28, 10, 60
+        panel = pygame.Rect(left - 5, top - 5, width + 190, len(self.timings) * (height + 6) + len(self.counters) * 18 + 10)
+        surface.fill((20, 20, 20), panel)
+        y = top
+        for name, values in self.timings.items():
+            pygame.draw.line(surface, (90, 90, 90), (left, y), (left + width, y))
+            points = [(left + x, y + height - min(value / budget, 1) * height) for x, value in enumerate(values)]
+            if len(points) > 1:
+                pygame.draw.lines(surface, (120, 220, 120), False, points)
+            surface.blit(self.label(name).render(f'{values[-1]:.2f} ms'), (left + width + 10, y + height / 2 - 7))
+            y += height + 6
+        for name, values in self.counters.items():
+            surface.blit(self.label(name).render(values[-1]), (left, y))
+            y += 18
+
+profiler = Profiler()
@@ -0,0 +1,104 @@
+from settings import *
+import struct
+import zlib
+
+# header: magic, version, spawn seed, fixed dt in seconds (0 when every frame stores its own), swarm mode
+HEADER = struct.Struct('<4sBQdB')
+MAGIC = b'VREC'
+VERSION = 3
+
+# the keys Player.input reads, one bit each
+RECORDED_KEYS = (pygame.K_RIGHT, pygame.K_d, pygame.K_LEFT, pygame.K_a, pygame.K_DOWN, pygame.K_s, pygame.K_UP, pygame.K_w)
+
+# a frame is a flags byte followed by the fields that changed since the frame before
+KEYS_CHANGED, MOUSE_CHANGED, BUTTONS_CHANGED, DT_CHANGED, CAP_CHANGED = 1, 2, 4, 8, 16
+MOUSE = struct.Struct('<hh')
+# frame time in ms; a frame after the window was stalled for minutes must still fit
+DT = struct.Struct('<I')
+# the spawn director's live enemy cap, 0 for none
+CAP = struct.Struct('<H')
+
+def key_bits(keys):
+    return sum(1 << bit for bit, key in enumerate(RECORDED_KEYS) if keys[key])
+
+def button_bits(buttons):
+    return sum(1 << bit for bit, pressed in enumerate(buttons[:3]) if pressed)
+
+class Recorder:
+    def __init__(self, path, seed, fixed_dt = None, swarm = False):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, fixed_dt or 0, swarm))
+        self.compressor = zlib.compressobj(9)
+        self.fixed_dt = fixed_dt
+        self.last = (0, (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2), 0, None, 0)
+        self.frames = 0
+
+    def record(self, controls, dt, cap = None):
+        keys, buttons = key_bits(controls.keys), button_bits(controls.mouse_buttons)
+        mouse_pos = (int(controls.mouse_pos[0]), int(controls.mouse_pos[1]))
+        ms = None if self.fixed_dt else round(dt * 1000)
+        cap = cap or 0
+        last_keys, last_mouse_pos, last_buttons, last_ms, last_cap = self.last
+
+        flags, fields = 0, b''
+        if keys != last_keys:
+            flags |= KEYS_CHANGED
+            fields += bytes((keys,))
+        if mouse_pos != last_mouse_pos:
+            flags |= MOUSE_CHANGED
+            fields += MOUSE.pack(*mouse_pos)
+        if buttons != last_buttons:
+            flags |= BUTTONS_CHANGED
+            fields += bytes((buttons,))
+        if ms != last_ms:
+            flags |= DT_CHANGED
+            fields += DT.pack(ms)
+        if cap != last_cap:
+            flags |= CAP_CHANGED
+            fields += CAP.pack(cap)
+        self.file.write(self.compressor.compress(bytes((flags,)) + fields))
+        self.last = (keys, mouse_pos, buttons, ms, cap)
+        self.frames += 1
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+class Recording:
+    def __init__(self, seed, fixed_dt, swarm, frames):
+        self.seed = seed
+        self.fixed_dt = fixed_dt
+        self.swarm = swarm
+        # (pressed keys, mouse position, mouse buttons, dt in seconds, enemy cap or None) per frame
+        self.frames = frames
+
+def read_recording(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, fixed_dt, swarm = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} recording')
+    body = zlib.decompress(data[HEADER.size:])
+
+    frames, index = [], 0
+    keys, mouse_pos, buttons, dt, cap = (), (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2), (False, False, False), fixed_dt, 0
+    while index < len(body):
+        flags = body[index]
+        index += 1
+        if flags & KEYS_CHANGED:
+            keys = tuple(key for bit, key in enumerate(RECORDED_KEYS) if body[index] & 1 << bit)
+            index += 1
+        if flags & MOUSE_CHANGED:
+            mouse_pos = MOUSE.unpack_from(body, index)
+            index += MOUSE.size
+        if flags & BUTTONS_CHANGED:
+            buttons = tuple(bool(body[index] & 1 << bit) for bit in range(3))
+            index += 1
+        if flags & DT_CHANGED:
+            dt = DT.unpack_from(body, index)[0] / 1000
+            index += DT.size
+        if flags & CAP_CHANGED:
+            cap = CAP.unpack_from(body, index)[0]
+            index += CAP.size
+        frames.append((keys, mouse_pos, buttons, dt, cap or None))
+    return Recording(seed, fixed_dt or None, bool(swarm), frames)
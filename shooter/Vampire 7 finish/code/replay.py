@@ -0,0 +1,47 @@
+import argparse
+import os
+from time import perf_counter
+from settings import *
+from main import Game, game_dir
+from controls import controls
+from recording import read_recording
+
+def replay(game, recording, render_every = 0):
+    # the same steps as a played frame, as fast as they run; returns the frame the player died on
+    game.swarm_mode = recording.swarm
+    game.reset()
+    game.random.seed(recording.seed)
+    # the enemy cap follows the recorded one instead of this machine's frame times
+    game.director.adaptive = False
+    for frame, (keys, mouse_pos, mouse_buttons, dt, cap) in enumerate(recording.frames):
+        controls.set(keys, mouse_pos, mouse_buttons)
+        game.director.cap = cap
+        pygame.event.pump()
+        game.step(dt)
+        if render_every and frame % render_every == 0:
+            game.draw()
+        if game.state == 'GAME_OVER':
+            return frame
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Play a recorded game back headless and report how it ended.')
+    parser.add_argument('recording')
+    parser.add_argument('--render-every', type = int, default = 0, metavar = 'N', help = 'draw every Nth frame, never by default')
+    args = parser.parse_args()
+
+    recording = read_recording(os.path.abspath(args.recording))
+    os.chdir(game_dir)
+    game = Game(headless = True, fixed_dt = recording.fixed_dt)
+    game.state = 'PLAYING'
+    start = perf_counter()
+    death_frame = replay(game, recording, args.render_every)
+    elapsed = perf_counter() - start
+    played = sum(frame[3] for frame in recording.frames[:len(recording.frames) if death_frame is None else death_frame + 1])
+    print(f'frames: {len(recording.frames)}')
+    print(f'score: {game.score}')
+    print(f'death frame: {death_frame if death_frame is not None else "survived"}')
+    print(f'replayed {played:.1f} s of play in {elapsed:.1f} s ({played / elapsed:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+from settings import *
+
+class FrameScheduler:
+    def __init__(self, fps = FPS):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.full_redraw = True
+        self.dirty_rects = []
+
+    def tick(self, uncapped = False):
+        # gameplay frames: sleep off the rest of the frame budget, return dt in seconds
+        return self.clock.tick(0 if uncapped else self.fps) / 1000
+
+    def wait(self, timeout = IDLE_TIMEOUT):
+        # static screens: block until there is input or the timeout passes
+        event = pygame.event.wait(max(1, int(timeout)))
+        events = [event] if event.type != pygame.NOEVENT else []
+        events += pygame.event.get()
+        for event in events:
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate()
+        # the idle time must not show up as one long frame when gameplay resumes
+        self.clock.tick()
+        return events
+
+    def invalidate(self, rect = None):
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def present(self):
+        if self.full_redraw:
+            pygame.display.update()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+        self.full_redraw = False
+        self.dirty_rects.clear()
@@ -0,0 +1,110 @@
+from settings import *
+import json
+import os
+from bisect import bisect_right
+from queue import Queue
+from threading import Thread
+
+class ScoreStore:
+    # the best HIGH_SCORE_LIMIT entries in memory, every new entry appended to a log and the log
+    # folded into an atomically replaced snapshot from time to time, all disk work on one thread
+    def __init__(self, path, limit = HIGH_SCORE_LIMIT):
+        self.path = path
+        self.log_path = path + '.log'
+        self.limit = limit
+        self.scores = []
+        self.keys = []
+        self.best_scores = {}
+        self.sequence = 0
+        self.logged = 0
+        self.load()
+
+        self.queue = Queue()
+        self.writer = Thread(target = self.write_loop, daemon = True)
+        self.writer.start()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = []
+        # the old format is a plain sorted list
+        if isinstance(data, list):
+            data = {'scores': data}
+        self.sequence = data.get('sequence', 0)
+        for entry in data.get('scores', []):
+            self.insert(entry)
+        self.best_scores.update(data.get('best', {}))
+
+        try:
+            with open(self.log_path, 'rb+') as f:
+                log = f.read()
+                # drop a line cut short by a crash, so the next append starts clean
+                complete = log[:log.rfind(b'\n') + 1]
+                if len(complete) < len(log):
+                    f.truncate(len(complete))
+        except OSError:
+            complete = b''
+        for line in complete.splitlines():
+            try:
+                sequence, name, score = json.loads(line)
+            except ValueError:
+                continue
+            if sequence > self.sequence:
+                self.sequence = sequence
+                self.logged += 1
+                self.insert({'name': name, 'score': score})
+
+    def insert(self, entry):
+        # equal scores keep their arrival order
+        index = bisect_right(self.keys, -entry['score'])
+        if index < self.limit:
+            self.keys.insert(index, -entry['score'])
+            self.scores.insert(index, entry)
+            del self.keys[self.limit:], self.scores[self.limit:]
+        if entry['score'] > self.best_scores.get(entry['name'], -1):
+            self.best_scores[entry['name']] = entry['score']
+
+    def add(self, name, score):
+        self.sequence += 1
+        self.insert({'name': name, 'score': score})
+        self.queue.put(('append', json.dumps([self.sequence, name, score])))
+        self.logged += 1
+        if self.logged >= HIGH_SCORE_COMPACT:
+            self.queue.put(('compact', json.dumps({'scores': self.scores, 'best': self.best_scores, 'sequence': self.sequence}, indent = 4)))
+            self.logged = 0
+
+    def top(self, count):
+        return self.scores[:count]
+
+    def best(self, name):
+        return self.best_scores.get(name)
+
+    def write_loop(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                break
+            kind, data = task
+            try:
+                if kind == 'append':
+                    with open(self.log_path, 'a') as f:
+                        f.write(data + '\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    # the snapshot names the last entry it holds, so a crash before the log is cleared only repeats skipped lines
+                    temp_path = self.path + '.tmp'
+                    with open(temp_path, 'w') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_path, self.path)
+                    open(self.log_path, 'w').close()
+            except OSError:
+                pass
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
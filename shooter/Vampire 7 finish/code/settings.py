@@ -3,4 +3,55 @@ from os.path import join
 from os import walk
 
 WINDOW_WIDTH, WINDOW_HEIGHT = 1280,720 
-TILE_SIZE = 64
\ No newline at end of file
+TILE_SIZE = 64
+FPS = 60
+IDLE_TIMEOUT = 1000
+LOAD_SLICE = 4
+CHUNK_SIZE = 16
+COMBAT_CELL_SIZE = 128
+
+# pre-rotated gun images, in degrees per step and images kept
+GUN_ROTATION_STEP = 2
+ROTATION_CACHE_SIZE = 360
+
+# rendered text surfaces kept for the menus
+TEXT_CACHE_SIZE = 128
+
+# enemies steer along a shared flow field instead of straight at the player
+FLOW_FIELD = True
+
+# numpy swarm engine for enemies
+SWARM_MODE = False
+SWARM_COLLISION_CELL = 8
+
+# mixer channels, voices allowed per effect priority and the window in ms that drops a repeated effect
+AUDIO_CHANNELS = 16
+AUDIO_PRIORITY_VOICES = {0: 6, 1: 4, 2: 2}
+SOUND_REPEAT_WINDOW = 30
+
+# spawn waves as (seconds into the game, ms between waves, enemies per wave), interpolated between points
+SPAWN_CURVE = ((0, 1000, 1), (60, 800, 2), (180, 600, 3), (300, 500, 4))
+
+# live enemy cap kept inside the frame budget: starting value and limits, raised by a step after a window of
+# frames under the headroom share of the budget, cut by a factor after a window over it
+SPAWN_CAP = 150
+SPAWN_CAP_MIN = 20
+SPAWN_CAP_MAX = 400
+SPAWN_CAP_STEP = 10
+SPAWN_CAP_DECREASE = 0.75
+FRAME_BUDGET_WINDOW = 30
+FRAME_BUDGET_HEADROOM = 0.8
+
+# enemies held back by the cap, and the most merged into one unit
+SPAWN_BACKLOG = 64
+SPAWN_MAX_STRENGTH = 8
+
+# enemies this far outside the screen can be despawned when the cap is cut
+DESPAWN_MARGIN = 400
+
+# frames shown in the profiler graphs
+PROFILER_HISTORY = 240
+
+# high scores kept, and new entries logged before they are folded into the snapshot
+HIGH_SCORE_LIMIT = 100
+HIGH_SCORE_COMPACT = 32
\ No newline at end of file
@@ -0,0 +1,36 @@
+from settings import *
+
+class SpatialHash:
+    def __init__(self, cell_size = TILE_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.items = []
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        columns = range(rect.left // size, (rect.right - 1) // size + 1)
+        rows = range(rect.top // size, (rect.bottom - 1) // size + 1)
+        return columns, rows
+
+    def insert(self, rect, item = None):
+        index = len(self.items)
+        self.items.append(rect if item is None else item)
+        columns, rows = self.cell_range(rect)
+        for x in columns:
+            for y in rows:
+                self.cells.setdefault((x, y), []).append(index)
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
+
+    def query(self, rect):
+        # items come back once each, in insertion order
+        found = set()
+        columns, rows = self.cell_range(rect)
+        for x in columns:
+            for y in rows:
+                cell = self.cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return [self.items[index] for index in sorted(found)]
\ No newline at end of file
@@ -1,19 +1,48 @@
 from settings import * 
 from math import atan2, degrees
-
-class Sprite(pygame.sprite.Sprite):
-    def __init__(self, pos, surf, groups):
-        super().__init__(groups)
-        self.image = surf
-        self.rect = self.image.get_rect(topleft = pos)
-        self.ground = True
+from collections import OrderedDict
+from controls import controls
+from atlas import load_atlas
+from timing import game_clock
 
 class CollisionSprite(pygame.sprite.Sprite):
+    static = True
+
     def __init__(self, pos, surf, groups):
         super().__init__(groups)
         self.image = surf
         self.rect = self.image.get_rect(topleft = pos)
 
+class RotationCache:
+    def __init__(self, surf, step = GUN_ROTATION_STEP, size = ROTATION_CACHE_SIZE):
+        self.surf = surf
+        self.step = step
+        self.size = size
+        self.images = OrderedDict()
+
+    def get(self, angle, flipped = False):
+        # angles snap to the step, least recently used images are dropped past the size
+        key = (round(angle / self.step) * self.step % 360, flipped)
+        image = self.images.get(key)
+        if image:
+            self.images.move_to_end(key)
+        else:
+            image = pygame.transform.rotozoom(self.surf, key[0], 1)
+            if flipped:
+                image = pygame.transform.flip(image, False, True)
+            self.images[key] = image
+            if len(self.images) > self.size:
+                self.images.popitem(last = False)
+        return image
+
+rotations = {}
+
+def get_rotations(surf):
+    # one cache per source image, so the rotations survive the Gun being rebuilt every game
+    if surf not in rotations:
+        rotations[surf] = RotationCache(surf)
+    return rotations[surf]
+
 class Gun(pygame.sprite.Sprite):
     def __init__(self, player, groups):
         # player connection 
@@ -23,110 +52,168 @@ class Gun(pygame.sprite.Sprite):
 
         # sprite setup 
         super().__init__(groups)
-        self.gun_surf = pygame.image.load(join('images', 'gun', 'gun.png')).convert_alpha()
+        self.gun_surf = load_atlas('gun').frame('gun')
         self.image = self.gun_surf
+        self.rotations = get_rotations(self.gun_surf)
+        self.rotated_direction = None
         self.rect = self.image.get_rect(center = self.player.rect.center + self.player_direction * self.distance)
     
     def get_direction(self):
-        mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
+        mouse_pos = pygame.Vector2(controls.mouse_pos)
         player_pos = pygame.Vector2(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)
-        self.player_direction = (mouse_pos - player_pos).normalize()
+        if mouse_pos != player_pos:
+            self.player_direction = (mouse_pos - player_pos).normalize()
 
     def rotate_gun(self):
+        if self.player_direction == self.rotated_direction:
+            return
+        self.rotated_direction = pygame.Vector2(self.player_direction)
         angle = degrees(atan2(self.player_direction.x, self.player_direction.y)) - 90
         if self.player_direction.x > 0:
-            self.image = pygame.transform.rotozoom(self.gun_surf, angle, 1)
+            self.image = self.rotations.get(angle)
         else:
-            self.image = pygame.transform.rotozoom(self.gun_surf, abs(angle), 1)
-            self.image = pygame.transform.flip(self.image, False, True)
+            self.image = self.rotations.get(abs(angle), True)
 
     def update(self, _):
         self.get_direction()
         self.rotate_gun()
         self.rect.center = self.player.rect.center + self.player_direction * self.distance
 
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, surf, pos, direction, groups):
+class PooledSprite(pygame.sprite.Sprite):
+    __slots__ = ('pool',)
+
+    def __init__(self, groups = ()):
         super().__init__(groups)
-        self.image = surf 
-        self.rect = self.image.get_rect(center = pos)
-        self.spawn_time = pygame.time.get_ticks()
-        self.lifetime = 1000
+        self.pool = None
+
+    def recycle(self):
+        if self.pool:
+            self.pool.release(self)
+        else:
+            self.kill()
 
-        self.direction = direction 
+class Bullet(PooledSprite):
+    __slots__ = ('image', 'mask', 'rect', 'spawn_time', 'lifetime', 'direction', 'speed')
+
+    def __init__(self, surf, mask, pos, direction, groups = ()):
+        super().__init__(groups)
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.direction = pygame.Vector2()
+        self.lifetime = 1000
         self.speed = 1200 
+        self.spawn(surf, mask, pos, direction)
+
+    def spawn(self, surf, mask, pos, direction):
+        self.image = surf 
+        self.mask = mask
+        self.rect.size = self.image.get_size()
+        self.rect.center = pos
+        self.spawn_time = game_clock.get_ticks()
+        self.direction.update(direction)
     
     def update(self, dt):
         self.rect.centerx += self.direction.x * self.speed * dt
         self.rect.centery += self.direction.y * self.speed * dt
 
-        if pygame.time.get_ticks() - self.spawn_time >= self.lifetime:
-            self.kill()
+        if game_clock.get_ticks() - self.spawn_time >= self.lifetime:
+            self.recycle()
 
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, pos, frames, groups, player, collision_sprites):
+class Enemy(PooledSprite):
+    __slots__ = ('player', 'frames', 'frame_index', 'masks', 'silhouette', 'image', 'mask', 'animation_speed',
+                 'rect', 'hitbox_rect', 'position', 'collision_grid', 'flow_field', 'direction', 'speed', 'health', 'death_time', 'death_duration')
+
+    def __init__(self, pos, frames, masks, silhouette, player, collision_grid, flow_field = None, health = 1, groups = ()):
         super().__init__(groups)
+        self.animation_speed = 6
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.hitbox_rect = pygame.Rect(0, 0, 0, 0)
+        self.position = pygame.Vector2()
+        self.direction = pygame.Vector2()
+        self.speed = 200
+        self.death_duration = 400
+        self.spawn(pos, frames, masks, silhouette, player, collision_grid, flow_field, health)
+
+    def spawn(self, pos, frames, masks, silhouette, player, collision_grid, flow_field = None, health = 1):
         self.player = player
+        # merged spawns take one hit per enemy they stand for
+        self.health = health
 
         # image 
         self.frames, self.frame_index = frames, 0 
+        self.masks = masks
+        self.silhouette = silhouette
         self.image = self.frames[self.frame_index]
-        self.animation_speed = 6
+        self.mask = self.masks[self.frame_index]
 
         # rect 
-        self.rect = self.image.get_rect(center = pos)
-        self.hitbox_rect = self.rect.inflate(-20,-40)
-        self.collision_sprites = collision_sprites
-        self.direction = pygame.Vector2()
-        self.speed = 200
+        self.rect.size = self.image.get_size()
+        self.rect.center = pos
+        self.hitbox_rect.update(self.rect.inflate(-20,-40))
+        self.position.update(self.hitbox_rect.center)
+        self.collision_grid = collision_grid
+        self.flow_field = flow_field
+        self.direction.update(0, 0)
 
         # timer 
         self.death_time = 0
-        self.death_duration = 400
     
     def animate(self, dt):
         self.frame_index += self.animation_speed * dt
-        self.image = self.frames[int(self.frame_index) % len(self.frames)]
+        index = int(self.frame_index) % len(self.frames)
+        self.image = self.frames[index]
+        self.mask = self.masks[index]
 
     def move(self, dt):
         # get direction 
-        player_pos = pygame.Vector2(self.player.rect.center)
-        enemy_pos = pygame.Vector2(self.rect.center)
-        direction_vector = player_pos - enemy_pos
-        
-        if direction_vector.length() > 0:
-            self.direction = direction_vector.normalize()
+        flow_direction = self.flow_field.direction(self.hitbox_rect.center) if self.flow_field else None
+        if flow_direction:
+            self.direction = pygame.Vector2(flow_direction)
         else:
-            self.direction = pygame.Vector2() # Default to no movement
-
-        # update the rect position + collision
-        self.hitbox_rect.x += self.direction.x * self.speed * dt
+            player_pos = pygame.Vector2(self.player.rect.center)
+            enemy_pos = pygame.Vector2(self.rect.center)
+            direction_vector = player_pos - enemy_pos
+
+            if direction_vector.length() > 0:
+                self.direction = direction_vector.normalize()
+            else:
+                self.direction = pygame.Vector2() # Default to no movement
+
+        # update the rect position + collision, keeping the sub-pixel part in self.position
+        self.position.x += self.direction.x * self.speed * dt
+        self.hitbox_rect.centerx = self.position.x
         self.collision('horizontal')
-        self.hitbox_rect.y += self.direction.y * self.speed * dt
+        self.position.y += self.direction.y * self.speed * dt
+        self.hitbox_rect.centery = self.position.y
         self.collision('vertical')
         self.rect.center = self.hitbox_rect.center
 
     def collision(self, direction):
-        for sprite in self.collision_sprites:
-            if sprite.rect.colliderect(self.hitbox_rect):
+        for rect in self.collision_grid.query(self.hitbox_rect):
+            if rect.colliderect(self.hitbox_rect):
                 if direction == 'horizontal':
-                    if self.direction.x > 0: self.hitbox_rect.right = sprite.rect.left
-                    if self.direction.x < 0: self.hitbox_rect.left = sprite.rect.right
+                    if self.direction.x > 0: self.hitbox_rect.right = rect.left
+                    if self.direction.x < 0: self.hitbox_rect.left = rect.right
+                    self.position.x = self.hitbox_rect.centerx
                 else:
-                    if self.direction.y < 0: self.hitbox_rect.top = sprite.rect.bottom
-                    if self.direction.y > 0: self.hitbox_rect.bottom = sprite.rect.top
+                    if self.direction.y < 0: self.hitbox_rect.top = rect.bottom
+                    if self.direction.y > 0: self.hitbox_rect.bottom = rect.top
+                    self.position.y = self.hitbox_rect.centery
+
+    def hit(self):
+        self.health -= 1
+        if self.health <= 0:
+            self.destroy()
 
     def destroy(self):
         # start a timer 
-        self.death_time = pygame.time.get_ticks()
+        self.death_time = game_clock.get_ticks()
         # change the image 
-        surf = pygame.mask.from_surface(self.frames[0]).to_surface()
-        surf.set_colorkey('black')
-        self.image = surf
+        self.image = self.silhouette
+        self.mask = self.masks[0]
     
     def death_timer(self):
-        if pygame.time.get_ticks() - self.death_time >= self.death_duration:
-            self.kill()
+        if game_clock.get_ticks() - self.death_time >= self.death_duration:
+            self.recycle()
 
     def update(self, dt):
         if self.death_time == 0:
@@ -0,0 +1,219 @@
+from settings import *
+from timing import game_clock
+from assets import get_silhouette
+from profiler import profiler
+import numpy as np
+
+class Swarm:
+    # per-enemy state, the first self.count rows are in use
+    ARRAYS = ('positions', 'hitboxes', 'speeds', 'frame_indices', 'death_times', 'types', 'healths')
+
+    def __init__(self, enemy_frames, enemy_masks, collision_rects, map_size, capacity = 256):
+        # enemy types
+        self.type_ids = {name: index for index, name in enumerate(enemy_frames)}
+        self.frames = list(enemy_frames.values())
+        self.masks = [enemy_masks[name] for name in enemy_frames]
+        self.death_surfs = [get_silhouette(frames[0]) for frames in self.frames]
+        self.frame_counts = [len(frames) for frames in self.frames]
+        self.image_sizes = np.array([frames[0].get_size() for frames in self.frames], dtype = float)
+        self.max_width = self.image_sizes[:, 0].max()
+        self.animation_speed = 6
+        self.speed = 200
+        self.death_duration = 400
+
+        # state
+        self.count = 0
+        self.positions = np.zeros((capacity, 2))
+        self.hitboxes = np.zeros((capacity, 2))
+        self.speeds = np.zeros(capacity)
+        self.frame_indices = np.zeros(capacity)
+        self.death_times = np.zeros(capacity)
+        self.types = np.zeros(capacity, dtype = np.intp)
+        self.healths = np.zeros(capacity, dtype = np.int32)
+        # image rects sorted by left edge, built on the first query after the rows move or change
+        self.index = None
+
+        self.build_blocked(collision_rects, map_size)
+
+    def __len__(self):
+        return self.count
+
+    def build_blocked(self, collision_rects, map_size):
+        # a coarse occupancy grid with a summed-area table, so any hitbox is tested in O(1)
+        cell = SWARM_COLLISION_CELL
+        columns, rows = -(-map_size[0] // cell), -(-map_size[1] // cell)
+        blocked = np.zeros((rows, columns), dtype = np.int32)
+        for rect in collision_rects:
+            left, right = np.ceil((np.array([rect.left, rect.right]) - cell / 2) / cell).astype(int).clip(0, columns)
+            top, bottom = np.ceil((np.array([rect.top, rect.bottom]) - cell / 2) / cell).astype(int).clip(0, rows)
+            blocked[top:bottom, left:right] = 1
+        self.blocked_sums = np.zeros((rows + 1, columns + 1), dtype = np.int32)
+        self.blocked_sums[1:, 1:] = blocked.cumsum(0).cumsum(1)
+
+    def blocked(self, centers, half_sizes):
+        cell = SWARM_COLLISION_CELL
+        rows, columns = self.blocked_sums.shape[0] - 1, self.blocked_sums.shape[1] - 1
+        first = np.floor((centers - half_sizes) / cell).astype(int)
+        last = np.floor((centers + half_sizes - 1) / cell).astype(int) + 1
+        left, right = first[:, 0].clip(0, columns), last[:, 0].clip(0, columns)
+        top, bottom = first[:, 1].clip(0, rows), last[:, 1].clip(0, rows)
+        sums = self.blocked_sums
+        return (sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]) > 0
+
+    def grow(self):
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros((len(array) * 2,) + array.shape[1:], dtype = array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def compact(self, keep):
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            kept = array[:self.count][keep]
+            array[:len(kept)] = kept
+        self.count = int(keep.sum())
+        self.index = None
+
+    def spawn(self, pos, enemy_type, health = 1):
+        if self.count == len(self.positions):
+            self.grow()
+        index, type_id = self.count, self.type_ids[enemy_type]
+        self.positions[index] = pos
+        self.hitboxes[index] = (self.image_sizes[type_id] - (20, 40)) / 2
+        self.speeds[index] = self.speed
+        self.frame_indices[index] = 0
+        self.death_times[index] = 0
+        self.types[index] = type_id
+        self.healths[index] = health
+        self.count += 1
+        self.index = None
+
+    def destroy(self, indices):
+        self.death_times[indices] = game_clock.get_ticks()
+
+    def hit(self, indices):
+        indices = np.asarray(indices, dtype = np.intp)
+        self.healths[indices] -= 1
+        self.destroy(indices[self.healths[indices] <= 0])
+
+    def far(self, rect):
+        # living enemies whose centre lies outside rect, farthest from its centre first
+        n = self.count
+        positions = self.positions[:n]
+        outside = ((positions[:, 0] < rect.left) | (positions[:, 0] >= rect.right) |
+                   (positions[:, 1] < rect.top) | (positions[:, 1] >= rect.bottom)) & (self.death_times[:n] == 0)
+        indices = np.flatnonzero(outside)
+        distances = np.hypot(positions[indices, 0] - rect.centerx, positions[indices, 1] - rect.centery)
+        return indices[np.argsort(-distances, kind = 'stable')]
+
+    def despawn(self, indices):
+        # removed without dying; returns the health they carried
+        health = int(self.healths[indices].sum())
+        keep = np.ones(self.count, dtype = bool)
+        keep[indices] = False
+        self.compact(keep)
+        return health
+
+    def move_axis(self, indices, axis, steps):
+        # a step into blocked cells is dropped, unless the enemy is already inside them
+        centers, half_sizes = self.positions[indices], self.hitboxes[indices]
+        moved = centers.copy()
+        moved[:, axis] += steps
+        hit = self.blocked(moved, half_sizes) & ~self.blocked(centers, half_sizes)
+        moved[hit, axis] = centers[hit, axis]
+        self.positions[indices] = moved
+
+    def flow_directions(self, indices, flow_field):
+        # one lookup per occupied tile; NaN where the field says to steer straight
+        positions = self.positions[indices]
+        tiles = np.floor(positions / flow_field.tile_size).astype(int)
+        inside = (tiles[:, 0] >= 0) & (tiles[:, 0] < flow_field.columns) & (tiles[:, 1] >= 0) & (tiles[:, 1] < flow_field.rows)
+        tile_ids = np.where(inside, tiles[:, 1] * flow_field.columns + tiles[:, 0], -1)
+        unique_ids, inverse = np.unique(tile_ids, return_inverse = True)
+        table = np.array([flow_field.next_tile(tile_id if tile_id >= 0 else None) or (np.nan, np.nan) for tile_id in unique_ids.tolist()], dtype = float)
+        delta = table[inverse.reshape(-1)] - positions
+        length = np.hypot(delta[:, 0], delta[:, 1])[:, None]
+        return np.divide(delta, length, out = np.full_like(delta, np.nan), where = length > 0)
+
+    def update(self, dt, target_pos, flow_field = None):
+        if not self.count:
+            return
+        n = self.count
+
+        # seek
+        alive = np.flatnonzero(self.death_times[:n] == 0)
+        delta = np.asarray(target_pos, dtype = float) - self.positions[alive]
+        length = np.hypot(delta[:, 0], delta[:, 1])[:, None]
+        directions = np.divide(delta, length, out = np.zeros_like(delta), where = length > 0)
+        if flow_field and len(alive):
+            flow = self.flow_directions(alive, flow_field)
+            steer = ~np.isnan(flow[:, 0])
+            directions[steer] = flow[steer]
+        steps = directions * (self.speeds[alive] * dt)[:, None]
+        self.move_axis(alive, 0, steps[:, 0])
+        self.move_axis(alive, 1, steps[:, 1])
+
+        self.index = None
+
+        # animate
+        self.frame_indices[alive] += self.animation_speed * dt
+
+        # death timers
+        dying = self.death_times[:n] != 0
+        expired = dying & (game_clock.get_ticks() - self.death_times[:n] >= self.death_duration)
+        if expired.any():
+            self.compact(~expired)
+
+    def build_index(self):
+        sizes = self.image_sizes[self.types[:self.count]]
+        topleft = np.floor(self.positions[:self.count] - sizes / 2)
+        order = np.argsort(topleft[:, 0], kind = 'stable')
+        self.index = order, topleft[order, 0], topleft, sizes
+
+    def overlapping(self, rect):
+        # broadphase: only rows whose left edge lies less than the widest image left of rect can reach it
+        if self.index is None:
+            self.build_index()
+        order, lefts, topleft, sizes = self.index
+        start = np.searchsorted(lefts, rect.left - self.max_width, side = 'right')
+        end = np.searchsorted(lefts, rect.right, side = 'left')
+        candidates = order[start:end]
+        inside = ((topleft[candidates, 0] + sizes[candidates, 0] > rect.left) &
+                  (topleft[candidates, 1] < rect.bottom) & (topleft[candidates, 1] + sizes[candidates, 1] > rect.top))
+        indices = np.sort(candidates[inside])
+        return indices, topleft[indices].astype(int)
+
+    def frame(self, type_id, frame_index, death_time):
+        if death_time:
+            return self.death_surfs[type_id], self.masks[type_id][0]
+        frame = int(frame_index) % self.frame_counts[type_id]
+        return self.frames[type_id][frame], self.masks[type_id][frame]
+
+    def collide(self, sprite):
+        if not self.count:
+            return []
+        indices, topleft = self.overlapping(sprite.rect)
+        profiler.count('collision_tests', len(indices))
+        hits = []
+        states = zip(indices.tolist(), topleft.tolist(), self.types[indices].tolist(), self.frame_indices[indices].tolist(), self.death_times[indices].tolist())
+        for index, (x, y), type_id, frame_index, death_time in states:
+            _, mask = self.frame(type_id, frame_index, death_time)
+            if sprite.mask.overlap(mask, (x - sprite.rect.x, y - sprite.rect.y)):
+                hits.append(index)
+        return hits
+
+    def visible(self, camera_rect):
+        # only enemies on screen become (depth, image, topleft) draw entries, sorted by depth
+        if not self.count:
+            return []
+        indices, topleft = self.overlapping(camera_rect)
+        order = np.argsort(self.positions[indices, 1], kind = 'stable')
+        indices, topleft = indices[order], topleft[order]
+        depths = self.positions[indices, 1].astype(int)
+        drawables = []
+        states = zip(depths.tolist(), topleft.tolist(), self.types[indices].tolist(), self.frame_indices[indices].tolist(), self.death_times[indices].tolist())
+        for depth, pos, type_id, frame_index, death_time in states:
+            image, _ = self.frame(type_id, frame_index, death_time)
+            drawables.append((depth, image, pos))
+        return drawables
\ No newline at end of file
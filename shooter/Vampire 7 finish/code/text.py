@@ -0,0 +1,38 @@
+from settings import *
+from collections import OrderedDict
+
+fonts = {}
+rendered = OrderedDict()
+
+def get_font(size):
+    if size not in fonts:
+        fonts[size] = pygame.font.Font(None, size)
+    return fonts[size]
+
+def render_text(text, size, color = (255, 255, 255)):
+    # least recently used surfaces are dropped once TEXT_CACHE_SIZE is reached
+    key = (text, size, color)
+    surf = rendered.get(key)
+    if surf is not None:
+        rendered.move_to_end(key)
+    else:
+        surf = get_font(size).render(text, True, color)
+        rendered[key] = surf
+        if len(rendered) > TEXT_CACHE_SIZE:
+            rendered.popitem(last = False)
+    return surf
+
+class Label:
+    # text for a changing value, rendered again only when the value changes
+    def __init__(self, template, size, color = (255, 255, 255)):
+        self.template = template
+        self.size = size
+        self.color = color
+        self.value = None
+        self.image = None
+
+    def render(self, value):
+        if self.image is None or value != self.value:
+            self.value = value
+            self.image = get_font(self.size).render(self.template.format(value), True, self.color)
+        return self.image
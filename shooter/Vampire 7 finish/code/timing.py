@@ -0,0 +1,15 @@
+class GameClock:
+    # game time in milliseconds, advanced by the frame dt so timers follow the simulation, not the wall clock
+    def __init__(self):
+        self.ticks = 0
+
+    def reset(self):
+        self.ticks = 0
+
+    def advance(self, dt):
+        self.ticks += dt * 1000
+
+    def get_ticks(self):
+        return self.ticks
+
+game_clock = GameClock()